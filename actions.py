@@ -5,6 +5,7 @@ from typing import Optional, Tuple, TYPE_CHECKING
 import color
 import exceptions
 import tile_types
+from slotted import Slotted
 
 if TYPE_CHECKING:
     from engine import Engine
@@ -12,7 +13,9 @@ if TYPE_CHECKING:
     from entity import Actor, Entity, Item
 
 
-class Action:
+class Action(Slotted):
+    __slots__ = ("entity",)
+
     def __init__(self, entity: Actor) -> None:
         super().__init__()
         self.entity = entity
@@ -48,15 +51,14 @@ class PickupAction(Action):
 
         for item in self.engine.game_map.items:
             if actor_location_x == item.x and actor_location_y == item.y:
-                if len(inventory.items) >= inventory.capacity:
+                if not inventory.has_room_for(item):
                     raise exceptions.Impossible("Your inventory is full.")
 
-                self.engine.game_map.entities.remove(item)
+                self.engine.game_map.remove_entity(item)
                 item.gamemap.remove_entity_id(item.entity_id)
-                item.parent = self.entity.inventory
-                inventory.items.append(item)
+                inventory.add(item)
 
-                self.engine.message_log.add_message(f"You picked up the {item.name}!")
+                self.engine.message_log.add_message(f"You picked up the {item.display_name}!")
                 return
 
         raise exceptions.Impossible(f"There is nothing here to pick up")
@@ -118,6 +120,7 @@ class TakeDownStairsAction(Action):
                 self.engine.game_world.generate_floor()
                 self.engine.game_map.upstairs_location = self.entity.x, self.entity.y
                 self.engine.game_map.tiles[self.entity.x, self.entity.y] = tile_types.up_stairs
+                self.engine.game_map.dirty = True
             self.engine.message_log.add_message(
                 "You descend the staircase.", color.descend
             )
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import List, Optional, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+
+class AIState(IntEnum):
+    """Compact code for the kind of AI controlling an actor, stored in ActorTable.ai_state."""
+    NONE = 0
+    HOSTILE = 1
+    CONFUSED = 2
+
+
+class ActorTable:
+    """
+    Struct-of-arrays store for the hot fields of the actors on one GameMap.
+
+    Every actor added to the table is given a row, and from then on its position, HP and maximum HP
+    are read from and written to the columns here instead of its own attributes.
+    Power, defense, alive and ai_state are kept up to date by the actor whenever they change.
+    Bulk operations can then work directly on the columns, e.g. table.hp[rows] -= damage.
+    """
+
+    columns = ("x", "y", "hp", "hp_max", "power", "defense", "alive", "ai_state")
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype = np.int32)
+        self.y = np.zeros(capacity, dtype = np.int32)
+        self.hp = np.zeros(capacity, dtype = np.int32)
+        self.hp_max = np.zeros(capacity, dtype = np.int32)
+        self.power = np.zeros(capacity, dtype = np.int32)
+        self.defense = np.zeros(capacity, dtype = np.int32)
+        self.alive = np.zeros(capacity, dtype = bool)
+        self.ai_state = np.zeros(capacity, dtype = np.int8)
+        self.in_use = np.zeros(capacity, dtype = bool)  # Rows currently owned by an actor.
+
+        self.actors: List[Optional[Actor]] = [None] * capacity
+        self.free_rows: List[int] = list(reversed(range(capacity)))
+
+    def __len__(self) -> int:
+        return self.capacity - len(self.free_rows)
+
+    def grow(self) -> None:
+        """Double the number of rows."""
+        old_capacity = self.capacity
+        self.capacity *= 2
+        for name in self.columns + ("in_use",):
+            column = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype = column.dtype)
+            grown[:old_capacity] = column
+            setattr(self, name, grown)
+        self.actors.extend([None] * old_capacity)
+        self.free_rows.extend(reversed(range(old_capacity, self.capacity)))
+
+    def add(self, actor: Actor) -> int:
+        """Give 'actor' a row, copy its current fields into it and bind the actor to it."""
+        if not self.free_rows:
+            self.grow()
+        row = self.free_rows.pop()
+
+        self.in_use[row] = True
+        self.actors[row] = actor
+        self.x[row] = actor.x
+        self.y[row] = actor.y
+
+        actor.table, actor.row = self, row
+        actor.fighter.hp_attr.bind(self, row)
+        self.update_stats(actor)
+        self.update_ai(actor)
+
+        return row
+
+    def remove(self, actor: Actor) -> None:
+        """Copy the row back into 'actor' and release the row."""
+        row = actor.row
+        x, y = int(self.x[row]), int(self.y[row])
+
+        actor.table = None
+        actor.x, actor.y = x, y
+        actor.fighter.hp_attr.unbind()
+
+        self.in_use[row] = False
+        self.alive[row] = False
+        self.actors[row] = None
+        self.free_rows.append(row)
+
+    def update_stats(self, actor: Actor) -> None:
+        """Refresh the derived power and defense of 'actor'."""
+        self.power[actor.row] = actor.fighter.power
+        self.defense[actor.row] = actor.fighter.defense
+
+    def update_ai(self, actor: Actor) -> None:
+        """Refresh the alive flag and AI state of 'actor'."""
+        self.alive[actor.row] = actor.ai is not None
+        self.ai_state[actor.row] = actor.ai.ai_state if actor.ai is not None else AIState.NONE
+
+    def rows_of(self, actors: List[Actor]) -> Optional[np.ndarray]:
+        """Return the rows of 'actors', or None if any of them is not in this table."""
+        if any(actor.table is not self for actor in actors):
+            return None
+        return np.fromiter((actor.row for actor in actors), dtype = np.intp, count = len(actors))
+
+    @property
+    def living_rows(self) -> np.ndarray:
+        """Rows of every living actor in this table."""
+        return np.flatnonzero(self.in_use & self.alive)
@@ -0,0 +1,78 @@
+"""Periodic saving of the running game on a background thread."""
+from __future__ import annotations
+
+import threading
+import traceback
+from typing import Optional, Set, TYPE_CHECKING
+
+import color
+import save_format
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+_pending: Set[threading.Thread] = set()
+_pending_lock = threading.Lock()
+
+
+def wait_for_pending() -> None:
+    """Block until every autosave still being written has finished."""
+    with _pending_lock:
+        threads = list(_pending)
+    for thread in threads:
+        thread.join()
+
+
+class Autosaver:
+    """
+    Saves the game every 'interval' turns, 0 disables autosaving.
+
+    The snapshot is taken on the calling thread between turns, compressing and writing it to 'filename'
+    happens on a background thread so the game keeps going while it runs.
+    """
+
+    def __init__(
+            self, filename: str = "savegame.sav", interval: int = 100,
+            compression: str = save_format.DEFAULT_COMPRESSION,
+    ):
+        self.filename = filename
+        self.interval = interval
+        self.compression = compression
+        self.last_turn: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def update(self, engine: Engine) -> None:
+        """Start an autosave of 'engine' if it is due, call this after every turn."""
+        if self.error is not None:
+            engine.message_log.add_message(f"Autosave failed: {self.error}", color.error)
+            engine.save_id = None   # The file may not match the floors marked clean, write it all next time.
+            self.error = None
+
+        if self.interval <= 0 or not engine.player.is_alive or self.busy:
+            return
+        if self.last_turn is None or engine.turn_counter < self.last_turn:   # First turn, or a different game.
+            self.last_turn = engine.turn_counter
+        if engine.turn_counter - self.last_turn < self.interval:
+            return
+
+        self.last_turn = engine.turn_counter
+        snapshot = engine.snapshot_save(self.filename, self.compression)
+        self.thread = threading.Thread(target = self._write, args = (snapshot,), name = "autosave", daemon = True)
+        with _pending_lock:
+            _pending.add(self.thread)
+        self.thread.start()
+
+    def _write(self, snapshot: save_format.SaveSnapshot) -> None:
+        try:
+            snapshot.write()
+        except Exception as exc:
+            traceback.print_exc()
+            self.error = exc
+        finally:
+            with _pending_lock:
+                _pending.discard(threading.current_thread())
@@ -0,0 +1 @@
+"""Standalone benchmarks, run them as modules from the project root, e.g. 'python -m benchmarks.memory'."""
@@ -0,0 +1,39 @@
+"""Measure how much memory every spawned monster costs, including its components."""
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+
+import entity_factories
+from game_map import GameMap
+
+
+def bytes_per_monster(count: int = 1000) -> float:
+    """Spawn 'count' orcs on an empty map and return the average number of bytes allocated by each."""
+    game_map = GameMap(None, 100, 100, 1)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    for i in range(count):
+        entity_factories.orc.spawn(game_map, i % game_map.width, i // game_map.width)
+
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (after - before) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--count", type = int, default = 1000, help = "number of monsters to spawn")
+    args = parser.parse_args()
+
+    print(f"{bytes_per_monster(args.count):.0f} bytes per spawned monster ({args.count} spawned)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Play many seeded games headlessly across worker processes and aggregate what happened in them.
+
+Every game gets its own seed and is driven by a simple built-in bot, or by the inputs of a recorded replay.
+Each worker plays whole games and only sends back a small dict of stats per game, so throughput grows with
+the number of worker processes:
+
+    python -m benchmarks.simulate --games 1000 --workers 8 --output results.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import tcod
+
+import headless
+import input_handlers
+import perf
+import replay
+from actions import Action, BumpAction, EquipAction, ItemAction, PickupAction, TakeDownStairsAction, WaitAction
+from components.ai import movement_cost
+from components.consumable import HealingConsumable
+from engine import Engine
+from entity import Actor, Item
+from equipment_types import EquipmentType
+
+# How often the memory of a worker is sampled during a game, in turns.
+MEMORY_SAMPLE_TURNS = 50
+
+
+class Bot:
+    """
+    A simple player: heal when hurt, fight what it sees, pick up and equip items in view, then head downstairs.
+
+    It knows where the downstairs are without exploring, so it reaches deeper floors than a careful player would.
+    """
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)   # Its own generator, so the bot's choices don't shift the game's.
+
+    def step_towards(self, engine: Engine, x: int, y: int) -> Optional[Action]:
+        """Return a step along the cheapest path to (x, y), None if there is no path."""
+        player = engine.player
+        graph = tcod.path.SimpleGraph(cost = movement_cost(engine.game_map), cardinal = 2, diagonal = 3)
+        pathfinder = tcod.path.Pathfinder(graph)
+        pathfinder.add_root((player.x, player.y))
+        path = pathfinder.path_to((x, y))[1:].tolist()
+        if not path:
+            return None
+        return BumpAction(player, path[0][0] - player.x, path[0][1] - player.y)
+
+    def act(self, engine: Engine) -> Action:
+        player = engine.player
+        game_map = engine.game_map
+        fighter, inventory = player.fighter, player.inventory
+
+        if fighter.hp_attr.value < fighter.hp_attr.max // 2:
+            for item in inventory.items:
+                if item.consumable is not None and isinstance(item.consumable, HealingConsumable):
+                    return ItemAction(player, item)
+
+        for item in inventory.items:
+            if item.equippable is not None and not player.equipment.item_is_equipped(item):
+                slot = "weapon" if item.equippable.equipment_type == EquipmentType.WEAPON else "armor"
+                if getattr(player.equipment, slot) is None:
+                    return EquipAction(player, item)
+
+        enemies = [
+            actor for actor in game_map.actors
+            if actor is not player and game_map.visible[actor.x, actor.y]
+        ]
+        if enemies:
+            target = min(enemies, key = lambda actor: max(abs(actor.x - player.x), abs(actor.y - player.y)))
+            step = self.step_towards(engine, target.x, target.y)
+            if step is not None:
+                return step
+
+        items: List[Item] = [
+            item for item in game_map.items
+            if game_map.visible[item.x, item.y] and inventory.has_room_for(item)
+        ]
+        for item in items:
+            if (item.x, item.y) == (player.x, player.y):
+                return PickupAction(player)
+        if items:
+            target_item = min(items, key = lambda item: max(abs(item.x - player.x), abs(item.y - player.y)))
+            step = self.step_towards(engine, target_item.x, target_item.y)
+            if step is not None:
+                return step
+
+        if (player.x, player.y) == game_map.downstairs_location:
+            return TakeDownStairsAction(player)
+        step = self.step_towards(engine, *game_map.downstairs_location)
+        if step is not None:
+            return step
+
+        return self.wander(player)
+
+    def wander(self, player: Actor) -> Action:
+        """Return a step in a random direction, or waiting."""
+        dx, dy = self.random.choice([(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1), (0, 0)])
+        if dx == dy == 0:
+            return WaitAction(player)
+        return BumpAction(player, dx, dy)
+
+    def level_up(self, game: headless.Game) -> None:
+        """Pick a random bonus in the level up menu."""
+        game.handler.present_selection = self.random.randrange(3)
+        game.press(tcod.event.KeySym.RETURN)
+
+
+def timing_stats() -> Dict[str, Dict[str, float]]:
+    """Return the totals and percentiles of the perf timers over the whole game just played, see play."""
+    return {
+        name: {"total": rolling.total, "p50": rolling.p50, "p95": rolling.p95, "max": rolling.max}
+        for name, rolling in perf.timings.items()
+    }
+
+
+def play_bot(seed: int, max_turns: int) -> Dict[str, Any]:
+    """Play one game with the bot until it dies or 'max_turns' turns have passed."""
+    game = headless.Game(seed = seed)
+    engine = game.engine
+    bot = Bot(seed)
+    depth = 0
+    peak_memory = perf.resident_memory() or 0
+
+    failed = 0
+    while game.turn < max_turns and not game.game_over:
+        if isinstance(game.handler, input_handlers.LevelUpEventHandler):
+            bot.level_up(game)
+            continue
+
+        # Fall back to wandering when the bot keeps choosing something impossible, e.g. walking into a wall.
+        action = bot.act(engine) if failed < 3 else bot.wander(engine.player)
+        failed = 0 if game.perform(action) else failed + 1
+
+        depth = max(depth, engine.game_world.current_floor)
+        if game.turn % MEMORY_SAMPLE_TURNS == 0:
+            peak_memory = max(peak_memory, perf.resident_memory() or 0)
+
+    return {
+        "depth": depth,
+        "turns": game.turn,
+        "died": game.game_over,
+        "level": engine.player.level.current_level,
+        "peak_memory": peak_memory,
+    }
+
+
+def play_replay(seed: int, filename: str) -> Dict[str, Any]:
+    """Feed the inputs of the replay 'filename' to a game seeded with 'seed'."""
+    result = replay.play(filename, seed = seed)
+    handler = result["handler"]
+    engine = handler.engine if isinstance(handler, input_handlers.EventHandler) else None
+    return {
+        "depth": engine.game_world.current_floor if engine is not None else 0,
+        "turns": result["turns"],
+        "died": engine is not None and not engine.player.is_alive,
+        "level": engine.player.level.current_level if engine is not None else 0,
+        "peak_memory": perf.resident_memory(),
+    }
+
+
+def play(seed: int, max_turns: int, replay_file: Optional[str] = None) -> Dict[str, Any]:
+    """Play one game in this process and return its stats."""
+    perf.reset(window = None)   # Keep every sample, so the percentiles cover the whole game.
+    perf.enable()
+    start = time.perf_counter()
+    stats = play_replay(seed, replay_file) if replay_file else play_bot(seed, max_turns)
+    return {
+        "seed": seed,
+        **stats,
+        "seconds": time.perf_counter() - start,
+        "pathfinds": perf.counts["pathfinds"].total if "pathfinds" in perf.counts else 0,
+        "timings": timing_stats(),
+    }
+
+
+def _play(args: Tuple[int, int, Optional[str]]) -> Dict[str, Any]:
+    return play(*args)
+
+
+def aggregate(games: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Summarize the stats of many games."""
+    turns = sum(game["turns"] for game in games)
+    depths = [game["depth"] for game in games]
+    phases = sorted({name for game in games for name in game["timings"]})
+    return {
+        "games": len(games),
+        "deaths": sum(game["died"] for game in games),
+        "depth": {
+            "mean": statistics.fmean(depths),
+            "median": statistics.median(depths),
+            "max": max(depths),
+            "histogram": {str(depth): depths.count(depth) for depth in sorted(set(depths))},
+        },
+        "turns": {"total": turns, "mean": turns / len(games)},
+        "wall_time": wall_time,
+        "turns_per_second": turns / wall_time if wall_time else 0.0,
+        # Mean time per turn over all games, and the worst p95 of a single game.
+        "timings": {
+            name: {
+                "mean_per_turn": sum(game["timings"].get(name, {}).get("total", 0.0) for game in games) / max(turns, 1),
+                "worst_p95": max(game["timings"].get(name, {}).get("p95", 0.0) for game in games),
+            }
+            for name in phases
+        },
+        "peak_memory": max((game["peak_memory"] or 0) for game in games),
+    }
+
+
+def run(games: int, workers: int, first_seed: int, max_turns: int, replay_file: Optional[str]) -> Dict[str, Any]:
+    jobs = [(first_seed + index, max_turns, replay_file) for index in range(games)]
+    start = time.perf_counter()
+    if workers <= 1:
+        results = [_play(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            # Several games per task keep the workers busy without sending a message per game.
+            chunk = max(1, games // (workers * 8))
+            results = list(executor.map(_play, jobs, chunksize = chunk))
+    return {"summary": aggregate(results, time.perf_counter() - start), "games": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type = int, default = 100)
+    parser.add_argument("--workers", type = int, default = os.cpu_count() or 1, help = "worker processes")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the first game, the rest count up")
+    parser.add_argument("--max-turns", type = int, default = 2000, help = "turns after which a bot game stops")
+    parser.add_argument("--replay", help = "drive the games with the inputs of this replay instead of the bot")
+    parser.add_argument("--output", "-o", help = "file to write the stats of every game to, as JSON")
+    args = parser.parse_args()
+
+    result = run(args.games, args.workers, args.seed, args.max_turns, args.replay)
+    summary = result["summary"]
+    print(
+        f"{summary['games']} games in {summary['wall_time']:.1f} s with {args.workers} workers, "
+        f"{summary['turns_per_second']:.0f} turns/s\n"
+        f"deaths {summary['deaths']}, depth mean {summary['depth']['mean']:.2f} max {summary['depth']['max']}, "
+        f"turns mean {summary['turns']['mean']:.0f}, peak memory {summary['peak_memory'] / 2 ** 20:.0f} MB",
+        file = sys.stderr,
+    )
+    for name, timing in summary["timings"].items():
+        print(f"  {name:20} {timing['mean_per_turn'] * 1000:8.3f} ms/turn  worst p95 {timing['worst_p95'] * 1000:8.3f} ms",
+              file = sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent = 1)
+
+
+if __name__ == "__main__":
+    main()
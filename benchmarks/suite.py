@@ -0,0 +1,309 @@
+"""
+Time the game's subsystems on seeded, headless scenarios.
+
+'run' times every benchmark at each map tiling and monster count and writes the timing distributions as JSON.
+'compare' checks such a file against a stored baseline and exits with status 1 if anything got slower:
+
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite run --output current.json
+    python -m benchmarks.suite compare baseline.json current.json
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np  # type: ignore
+import tcod
+
+import entity_factories
+import headless
+import render_standards
+import setup_game
+from engine import Engine
+from game_map import GameMap, GameWorld
+
+DEFAULT_TILINGS = (1, 3)
+DEFAULT_MONSTERS = (10, 100, 400)
+
+# A benchmark takes (seed, map tiling, monster count, repeat) and returns 'repeat' timings in seconds.
+Benchmark = Callable[[int, int, int, int], List[float]]
+
+
+def new_world(seed: int, map_tiling: int, floor: int) -> Engine:
+    """Return an Engine whose first generated floor is 'floor', 0 being the surface."""
+    random.seed(seed)
+    engine = Engine(player = copy.deepcopy(entity_factories.player))
+    engine.game_world = GameWorld(
+        engine = engine,
+        map_width = render_standards.map_width,
+        map_height = render_standards.map_height,
+        map_tiling = map_tiling,
+        max_rooms = 30,
+        room_min_size = 6,
+        room_max_size = 10,
+        current_floor = floor,
+    )
+    return engine
+
+
+def scenario(seed: int, map_tiling: int, monsters: int) -> headless.Game:
+    """
+    Return a game on the first dungeon floor with exactly 'monsters' orcs on it.
+
+    The generated monsters are replaced by orcs on random free floor tiles, so every scenario has the same mix.
+    The player can't be hurt, so the monsters keep taking turns for as long as the benchmark runs.
+    """
+    engine = new_world(seed, map_tiling, floor = 1)
+    engine.game_world.generate_floor()
+    game_map = engine.game_map
+    for actor in list(game_map.actors):
+        if actor is not engine.player:
+            game_map.remove_entity(actor)
+
+    free = game_map.tiles["walkable"].copy()
+    for entity in game_map.entities:
+        free[entity.x, entity.y] = False
+    xs, ys = np.nonzero(free)
+    if len(xs) < monsters:
+        raise ValueError(f"Only {len(xs)} free tiles for {monsters} monsters at map tiling {map_tiling}.")
+    for i in random.sample(range(len(xs)), monsters):
+        entity_factories.orc.spawn(game_map, int(xs[i]), int(ys[i]))
+
+    engine.player.fighter.add_modifier("benchmark", defense_bonus = 1000)
+    engine.update_fov()
+    return headless.Game(engine)
+
+
+def measure(function: Callable[[], Any], repeat: int) -> List[float]:
+    """Call 'function' once to warm up, then 'repeat' more times, and return how long each of those took."""
+    function()
+    samples = []
+    gc.collect()
+    gc.disable()    # As timeit does, so a collection triggered by earlier garbage isn't charged to one sample.
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            samples.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return samples
+
+
+def bench_entity_turns(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    engine = scenario(seed, map_tiling, monsters).engine
+    return measure(engine.handle_entity_turns, repeat)
+
+
+def bench_get_path_to(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    engine = scenario(seed, map_tiling, monsters).engine
+    player = engine.player
+    actors = itertools.cycle([actor for actor in engine.game_map.actors if actor is not player])
+    return measure(lambda: next(actors).ai.get_path_to(player.x, player.y), repeat)
+
+
+def bench_update_fov(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    engine = scenario(seed, map_tiling, monsters).engine
+    return measure(engine.update_fov, repeat)
+
+
+def bench_render(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    engine = scenario(seed, map_tiling, monsters).engine
+    console = headless.new_console()
+    return measure(lambda: engine.game_map.render(console), repeat)
+
+
+def bench_spawn(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    """Time spawning all 'monsters' orcs on an empty map."""
+    width, height = render_standards.map_width * map_tiling, render_standards.map_height * map_tiling
+
+    def spawn() -> None:
+        game_map = GameMap(None, width, height, map_tiling)
+        for i in range(monsters):
+            entity_factories.orc.spawn(game_map, i % width, i // width)
+
+    random.seed(seed)
+    return measure(spawn, repeat)
+
+
+def bench_generate(floor: int) -> Benchmark:
+    def bench(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+        engines = iter([new_world(seed + i, map_tiling, floor) for i in range(repeat + 1)])
+        return measure(lambda: next(engines).game_world.generate_floor(), repeat)
+    return bench
+
+
+def bench_save(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    engine = scenario(seed, map_tiling, monsters).engine
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = iter([os.path.join(directory, f"{i}.sav") for i in range(repeat + 1)])
+        return measure(lambda: engine.save_as(next(filenames)), repeat)
+
+
+def bench_load(seed: int, map_tiling: int, monsters: int, repeat: int) -> List[float]:
+    engine = scenario(seed, map_tiling, monsters).engine
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "benchmark.sav")
+        engine.save_as(filename)
+
+        loaded = setup_game.load_game(filename)
+        if (
+                (loaded.player.x, loaded.player.y) != (engine.player.x, engine.player.y)
+                or len(list(loaded.game_map.actors)) != len(list(engine.game_map.actors))
+        ):
+            raise RuntimeError("The loaded game doesn't match the one saved.")
+
+        return measure(lambda: setup_game.load_game(filename), repeat)
+
+
+# Name: (benchmark, repeat, whether it depends on the monster count)
+BENCHMARKS: Dict[str, Tuple[Benchmark, int, bool]] = {
+    "handle_entity_turns": (bench_entity_turns, 50, True),
+    "get_path_to": (bench_get_path_to, 100, True),
+    "update_fov": (bench_update_fov, 100, True),
+    "render": (bench_render, 100, True),
+    "spawn": (bench_spawn, 20, True),
+    "generate_dungeon": (bench_generate(floor = 1), 10, False),
+    "generate_surface": (bench_generate(floor = 0), 10, False),
+    "save_as": (bench_save, 10, True),
+    "load_game": (bench_load, 10, True),
+}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "max": ordered[-1],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def cases(
+        names: List[str], tilings: List[int], monster_counts: List[int]
+) -> Iterator[Tuple[str, str, int, Optional[int]]]:
+    """Yield (key, benchmark name, map tiling, monster count) of every case to run."""
+    for name in names:
+        by_monsters = BENCHMARKS[name][2]
+        for map_tiling in tilings:
+            for monsters in (monster_counts if by_monsters else [None]):
+                params = f"tiling={map_tiling}" + (f",monsters={monsters}" if by_monsters else "")
+                yield f"{name}[{params}]", name, map_tiling, monsters
+
+
+def run(
+        names: List[str], tilings: List[int], monster_counts: List[int], seed: int, repeat_scale: float
+) -> Dict[str, Any]:
+    results = {}
+    for key, name, map_tiling, monsters in cases(names, tilings, monster_counts):
+        benchmark, repeat, _ = BENCHMARKS[name]
+        samples = benchmark(seed, map_tiling, monsters or 0, max(2, round(repeat * repeat_scale)))
+        stats = summarize(samples)
+        print(f"{key:45} median {stats['median'] * 1000:9.3f} ms   p95 {stats['p95'] * 1000:9.3f} ms", file = sys.stderr)
+        results[key] = {
+            "benchmark": name,
+            "map_tiling": map_tiling,
+            "monsters": monsters,
+            **stats,
+            "samples": samples,
+        }
+
+    return {
+        "meta": {
+            "seed": seed,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "tcod": tcod.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float, min_delta: float) -> List[str]:
+    """
+    Print how the medians in 'current' changed from 'baseline' and return the keys which regressed.
+
+    A case regressed if its median grew by more than 'threshold' (a fraction) and by more than 'min_delta' seconds.
+    """
+    regressions = []
+    for key, now in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            print(f"{key:45} new")
+            continue
+        change = now["median"] / before["median"] - 1 if before["median"] else 0.0
+        regressed = change > threshold and now["median"] - before["median"] > min_delta
+        if regressed:
+            regressions.append(key)
+        print(
+            f"{key:45} {before['median'] * 1000:9.3f} ms -> {now['median'] * 1000:9.3f} ms  {change:+7.1%}"
+            + ("  REGRESSION" if regressed else "")
+        )
+    for key in sorted(baseline["results"].keys() - current["results"].keys()):
+        print(f"{key:45} missing")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    run_parser = commands.add_parser("run", help = "run the benchmarks and write the results as JSON")
+    run_parser.add_argument("--output", "-o", help = "file to write the results to, standard output by default")
+    run_parser.add_argument("--seed", type = int, default = 0)
+    run_parser.add_argument("--only", nargs = "+", choices = list(BENCHMARKS), default = list(BENCHMARKS),
+                            help = "benchmarks to run, all of them by default")
+    run_parser.add_argument("--tiling", nargs = "+", type = int, default = list(DEFAULT_TILINGS),
+                            help = "map tilings to run at")
+    run_parser.add_argument("--monsters", nargs = "+", type = int, default = list(DEFAULT_MONSTERS),
+                            help = "monster counts to run at")
+    run_parser.add_argument("--quick", action = "store_true", help = "take a tenth of the usual number of samples")
+
+    compare_parser = commands.add_parser("compare", help = "compare results against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type = float, default = 0.1,
+                                help = "fraction the median may grow by before it's a regression")
+    compare_parser.add_argument("--min-delta", type = float, default = 1e-5,
+                                help = "seconds the median may grow by before it's a regression")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.only, args.tiling, args.monsters, args.seed, 0.1 if args.quick else 1.0)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent = 1)
+        else:
+            json.dump(results, sys.stdout, indent = 1)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,71 @@
 from __future__ import annotations
 
 import random
-from typing import List, Optional, Tuple, TYPE_CHECKING
+from typing import Iterable, List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np  # type: ignore
 import tcod
 
+from actor_table import AIState
+import color
+import exceptions
+import perf
 from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction
+from render_functions import describe_actors
 
 
 if TYPE_CHECKING:
+    from engine import Engine
     from entity import Actor
+    from game_map import GameMap
+
+
+def movement_cost(game_map: GameMap) -> np.ndarray:
+    """Return the pathfinding cost array of a map, where tiles holding a blocking entity are more expensive."""
+    perf.count("entity_scans")
+    # Copy the walkable array
+    cost = np.array(game_map.tiles["walkable"], dtype = np.int8)
+
+    for entity in game_map.entities:
+        # Check that an entity blocks movement and the cost isn't zero (blocking).
+        if entity.blocks_movement and cost[entity.x, entity.y]:
+            # Add to the cost of a blocked position
+            # A lower number means more enemies will crowd behind each other in hallways
+            # A higher number means entities will take longer paths in order to surround the player
+            cost[entity.x, entity.y] += 10
+
+    return cost
 
 
 class BaseAI(Action):
+    __slots__ = ()
+
     entity: Actor
 
+    ai_state = AIState.NONE
+
     def perform(self) -> None:
         raise NotImplementedError()
 
+    @classmethod
+    def perform_batch(cls, engine: Engine, actors: List[Actor]) -> None:
+        """
+        Take the turn of every actor in 'actors', which are all controlled by this AI class.
+
+        By default each actor acts on its own, subclasses can override this to act for all of them at once.
+        """
+        for actor in actors:
+            try:
+                actor.ai.perform()
+            except exceptions.Impossible:
+                pass # Ignore impossible action exceptions from AI.
+
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position
 
         If there is no valid path then returns an empty list."""
-        # Copy the walkable array
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype = np.int8)
-
-        for entity in self.entity.gamemap.entities:
-            # Check that an entity blocks movement and the cost isn't zero (blocking).
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position
-                # A lower number means more enemies will crowd behind each other in hallways
-                # A higher number means entities will take longer paths in order to surround the player
-                cost[entity.x, entity.y] += 10
+        perf.count("pathfinds")
+        cost = movement_cost(self.entity.gamemap)
 
         # Create a graph from the cost array and pass that graph to a new pathfinder
         graph = tcod.path.SimpleGraph(cost = cost, cardinal = 2, diagonal = 3)
@@ -52,6 +85,9 @@ class ConfusedEnemy(BaseAI):
     A confused enemy will stumble around aimlessly for a given number of turns, then revert back to its previous AI.
     If an actor occupies a tile it is randomly moving into, it will attack
     """
+    __slots__ = ("previous_ai", "turns_remaining")
+
+    ai_state = AIState.CONFUSED
 
     def __init__(
             self, entity: Actor, previous_ai: Optional[BaseAI], turns_remaining: int
@@ -91,6 +127,10 @@ class ConfusedEnemy(BaseAI):
 
 
 class HostileEnemy(BaseAI):
+    __slots__ = ("path",)
+
+    ai_state = AIState.HOSTILE
+
     def __init__(self, entity: Actor):
         super().__init__(entity)
         self.path: List[Tuple[int, int]] = []
@@ -113,4 +153,150 @@ class HostileEnemy(BaseAI):
                 self.entity, dest_x - self.entity.x, dest_y - self.entity.y
             ).perform()
 
-        return WaitAction(self.entity).perform()
\ No newline at end of file
+        perf.count("dormant_actors")    # Out of sight with nowhere to go.
+        return WaitAction(self.entity).perform()
+
+    @classmethod
+    def perform_batch(cls, engine: Engine, actors: List[Actor]) -> None:
+        """
+        Take the turn of every hostile actor at once.
+
+        Visibility and distance to the player are tested for all actors together, every actor in view walks
+        down one distance field computed from the player, actors choosing the same tile are resolved so only
+        one of them moves there, and all melee attacks on the player are resolved as one hit.
+        """
+        if not actors:
+            return
+
+        game_map = engine.game_map
+        player = engine.player
+        table = game_map.actor_table
+        rows = table.rows_of(actors) if table is not None else None
+
+        if rows is not None:
+            xs, ys = table.x[rows].astype(np.intp), table.y[rows].astype(np.intp)
+        else:
+            xs = np.fromiter((actor.x for actor in actors), dtype = np.intp, count = len(actors))
+            ys = np.fromiter((actor.y for actor in actors), dtype = np.intp, count = len(actors))
+
+        visible = game_map.visible[xs, ys]
+        distance = np.maximum(abs(player.x - xs), abs(player.y - ys))  # Chebyshev distance.
+
+        attacking = visible & (distance <= 1)
+        chasing = visible & (distance > 1)
+
+        if chasing.any():
+            # One distance field from the player replaces a pathfinder per actor.
+            perf.count("pathfinds")
+            field = tcod.path.maxarray((game_map.width, game_map.height), dtype = np.int32)
+            field[player.x, player.y] = 0
+            tcod.path.dijkstra2d(field, movement_cost(game_map), 2, 3)
+            for index in np.flatnonzero(chasing).tolist():
+                path = tcod.path.hillclimb2d(field, (xs[index], ys[index]), True, True)[1:].tolist()
+                actors[index].ai.path = [(x, y) for x, y in path]
+
+        if perf.enabled:
+            perf.count("dormant_actors", sum(
+                not attacks and not actor.ai.path for actor, attacks in zip(actors, attacking.tolist())
+            ))
+
+        cls.resolve_movement(engine, actors, rows, xs, ys, ~attacking)
+        cls.resolve_melee(engine, [actor for actor, attacks in zip(actors, attacking.tolist()) if attacks], rows,
+                          attacking)
+
+    @staticmethod
+    def resolve_movement(
+            engine: Engine,
+            actors: List[Actor],
+            rows: Optional[np.ndarray],
+            xs: np.ndarray,
+            ys: np.ndarray,
+            may_move: np.ndarray,
+    ) -> None:
+        """Move every actor allowed by 'may_move' one step along its path, resolving actors choosing the same tile."""
+        game_map = engine.game_map
+
+        movers = [
+            index for index, allowed in enumerate(may_move.tolist()) if allowed and actors[index].ai.path
+        ]
+        if not movers:
+            return
+
+        movers_array = np.array(movers, dtype = np.intp)
+        steps = np.array([actors[index].ai.path.pop(0) for index in movers], dtype = np.intp).reshape(-1, 2)
+        dest_x, dest_y = steps[:, 0], steps[:, 1]
+
+        # A step is only taken onto a walkable tile next to the actor, the same as a MovementAction.
+        valid = (
+            (abs(dest_x - xs[movers_array]) <= 1)
+            & (abs(dest_y - ys[movers_array]) <= 1)
+            & (dest_x >= 0) & (dest_x < game_map.width)
+            & (dest_y >= 0) & (dest_y < game_map.height)
+        )
+        valid[valid] = game_map.tiles["walkable"][dest_x[valid], dest_y[valid]]
+
+        occupied = np.zeros((game_map.width, game_map.height), dtype = bool, order = "F")
+        for entity in game_map.entities:
+            if entity.blocks_movement:
+                occupied[entity.x, entity.y] = True
+
+        pending = np.flatnonzero(valid)
+        while pending.size:
+            free = pending[~occupied[dest_x[pending], dest_y[pending]]]
+            if not free.size:
+                break
+            # Only the first actor choosing a tile gets it, the rest try again against the updated occupancy.
+            _, first = np.unique(dest_x[free] * game_map.height + dest_y[free], return_index = True)
+            winners = free[first]
+
+            sources = movers_array[winners]
+            occupied[xs[sources], ys[sources]] = False
+            occupied[dest_x[winners], dest_y[winners]] = True
+            if rows is not None:
+                engine.game_map.actor_table.x[rows[sources]] = dest_x[winners]
+                engine.game_map.actor_table.y[rows[sources]] = dest_y[winners]
+            else:
+                for source, x, y in zip(sources.tolist(), dest_x[winners].tolist(), dest_y[winners].tolist()):
+                    actors[source].x, actors[source].y = x, y
+
+            pending = np.setdiff1d(pending, winners, assume_unique = True)
+
+    @staticmethod
+    def resolve_melee(
+            engine: Engine, attackers: List[Actor], rows: Optional[np.ndarray], attacking: np.ndarray
+    ) -> None:
+        """Resolve every attack on the player as a single hit with a single message."""
+        if not attackers:
+            return
+
+        target = engine.player
+        if rows is not None:
+            power = engine.game_map.actor_table.power[rows[attacking]].astype(np.int64)
+        else:
+            power = np.fromiter((actor.fighter.power for actor in attackers), dtype = np.int64, count = len(attackers))
+
+        # Same formula as MeleeAction.
+        defense = target.fighter.defense
+        if defense:
+            damage = (np.minimum(1.0, power / defense) * power).astype(np.int64)
+        else:
+            damage = power
+
+        hitting = damage > 0
+        hitters = [actor for actor, hits in zip(attackers, hitting.tolist()) if hits]
+        missers = [actor for actor, hits in zip(attackers, hitting.tolist()) if not hits]
+
+        if missers:
+            engine.message_log.add_message(
+                f"{describe_actors(missers)} {'attacks' if len(missers) == 1 else 'attack'} {target.name}"
+                f" but {'does' if len(missers) == 1 else 'do'} not damage.",
+                color.enemy_atk,
+            )
+        if hitters:
+            total = int(damage[hitting].sum())
+            engine.message_log.add_message(
+                f"{describe_actors(hitters)} {'attacks' if len(hitters) == 1 else 'attack'} {target.name}"
+                f" for {total} hit points.",
+                color.enemy_atk,
+            )
+            engine.apply_damage([target], total)
@@ -1,7 +1,17 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
 from components.base_component import BaseComponent
+from slotted import Slotted
+
+if TYPE_CHECKING:
+    from actor_table import ActorTable
 
-class Attribute():
+class Attribute(Slotted):
     """General class for all attributes (numerical stats with maxima and minima attached to entity components)"""
+    __slots__ = ("_current", "_max", "_min", "parent")
+
     parent: BaseComponent
 
     def __init__(self, current: int, max: int = 100000, min: int = 0):
@@ -14,17 +24,17 @@ class Attribute():
         return self._current
 
     def new_value(self, new_value: int) -> None:
-        self._current = min(self._max, max(self._min, new_value))
+        self._set_current(min(self.max, max(self._min, new_value)))
 
     def add_to_value(self, amount: int):
-        self.new_value(self._current + amount)
+        self.new_value(self.value + amount)
 
     @property
     def max(self) -> int:
         return self._max
 
     def new_max(self, new_max: int, match_current: bool = False) -> None:
-        self._max = max(self.value, new_max)
+        self._set_max(max(self.value, new_max))
         if match_current:
             self.new_value(new_max)
 
@@ -35,24 +45,83 @@ class Attribute():
     def new_min(self, new_min: int) -> None:
         self._min = min(self.value, new_min)
 
+    def _set_current(self, value: int) -> None:
+        self._current = value
+
+    def _set_max(self, value: int) -> None:
+        self._max = value
+
 
 class HealthAttribute(Attribute):
+    """
+    Hit points. While the owning actor is in an ActorTable, the current and maximum values live in its row.
+    """
+
+    __slots__ = ("table", "row")
 
     parent: BaseComponent
 
     name = "HP"
 
+    slot_defaults = {"table": None, "row": 0}
+
     def __init__(self, value: int):
         super().__init__(value, value)
+        self.table: Optional[ActorTable] = None
+        self.row = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state["_current"], state["_max"] = self.value, self.max
+        return state
+
+    @property
+    def value(self) -> int:
+        if self.table is None:
+            return self._current
+        return int(self.table.hp[self.row])
+
+    @property
+    def max(self) -> int:
+        if self.table is None:
+            return self._max
+        return int(self.table.hp_max[self.row])
+
+    def _set_current(self, value: int) -> None:
+        if self.table is None:
+            self._current = value
+        else:
+            self.table.hp[self.row] = value
+
+    def _set_max(self, value: int) -> None:
+        if self.table is None:
+            self._max = value
+        else:
+            self.table.hp_max[self.row] = value
+
+    def bind(self, table: ActorTable, row: int) -> None:
+        """Move the current and maximum values into 'row' of 'table'."""
+        table.hp[row] = self._current
+        table.hp_max[row] = self._max
+        self.table, self.row = table, row
+
+    def unbind(self) -> None:
+        """Move the current and maximum values back out of the ActorTable."""
+        self._current, self._max = self.value, self.max
+        self.table = None
 
 class DefenseAttribute(Attribute):
 
+    __slots__ = ()
+
     parent: BaseComponent
 
     name = "Base Defense"
 
 class PowerAttribute(Attribute):
 
+    __slots__ = ()
+
     parent: BaseComponent
 
     name = "Base Power"
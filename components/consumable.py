@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Optional, TYPE_CHECKING
 
+import numpy as np  # type: ignore
+
 import actions
 import color
 import components.inventory
@@ -18,6 +20,8 @@ if TYPE_CHECKING:
 
 
 class Consumable(BaseComponent):
+    __slots__ = ()
+
     parent: Item
 
     def get_action(self, consumer: Actor) -> Optional[ActionOrHandler]:
@@ -36,10 +40,12 @@ class Consumable(BaseComponent):
         entity = self.parent
         inventory = entity.parent
         if isinstance(inventory, components.inventory.Inventory):
-            inventory.items.remove(entity)
+            inventory.take(entity)
 
 
 class ConfusionConsumable(Consumable):
+    __slots__ = ("number_of_turns",)
+
     def __init__(self, number_of_turns: int):
         self.number_of_turns = number_of_turns
 
@@ -74,6 +80,8 @@ class ConfusionConsumable(Consumable):
 
 
 class HealingConsumable(Consumable):
+    __slots__ = ("amount",)
+
     def __init__(self, amount: int):
         self.amount = amount
 
@@ -92,6 +100,8 @@ class HealingConsumable(Consumable):
 
 
 class FireballDamageConsumable(Consumable):
+    __slots__ = ("damage", "radius")
+
     def __init__(self, damage: int, radius: int):
         self.damage = damage
         self.radius = radius
@@ -112,21 +122,26 @@ class FireballDamageConsumable(Consumable):
         if not self.engine.game_map.visible[target_xy]:
             raise Impossible("You cannot target an area that you cannot see")
 
-        targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.distance(*target_xy) <= self.radius:
-                self.engine.message_log.add_message(
-                    f"The {actor.name} is engulfed in a fiery explosion, taking {self.damage} damage!"
-                )
-                actor.fighter.take_damage(self.damage)
-                targets_hit = True
-
-        if not targets_hit:
+        actors = list(self.engine.game_map.actors)
+        positions = np.array([(actor.x, actor.y) for actor in actors], dtype = np.int64).reshape(-1, 2)
+        distances = np.hypot(positions[:, 0] - target_xy[0], positions[:, 1] - target_xy[1])
+        targets = [actor for actor, in_radius in zip(actors, (distances <= self.radius).tolist()) if in_radius]
+
+        if not targets:
             raise Impossible("There are no targets in the radius.")
+
+        self.engine.apply_damage(
+            targets,
+            self.damage,
+            f"The {{names}} {'is' if len(targets) == 1 else 'are'} engulfed in a fiery explosion, "
+            f"taking {{damage}} damage!",
+        )
         self.consume()
 
 
 class LightningDamageConsumable(Consumable):
+    __slots__ = ("damage", "maximum_range")
+
     def __init__(self, damage: int, maximum_range: int):
         self.damage = damage
         self.maximum_range = maximum_range
@@ -10,6 +10,8 @@ if TYPE_CHECKING:
 
 
 class Equipment(BaseComponent):
+    __slots__ = ("weapon", "armor")
+
     parent: Actor
 
     def __init__(self, weapon: Optional[Item] = None, armor: Optional[Item] = None):
@@ -40,6 +42,17 @@ class Equipment(BaseComponent):
 
         return bonus
 
+    def refresh_modifiers(self) -> None:
+        """Register the bonuses of every equipped item with the owner's Fighter."""
+        for slot in ("weapon", "armor"):
+            item = getattr(self, slot)
+            if item is not None and item.equippable is not None:
+                self.parent.fighter.add_modifier(
+                    slot, item.equippable.power_bonus.value, item.equippable.defense_bonus.value
+                )
+            else:
+                self.parent.fighter.remove_modifier(slot)
+
     def item_is_equipped(self, item: Item) -> bool:
         return self.weapon == item or self.armor == item
 
@@ -60,6 +73,10 @@ class Equipment(BaseComponent):
             self.unequip_from_slot(slot, add_message)
 
         setattr(self, slot, item)
+        self.parent.fighter.add_modifier(
+            slot, item.equippable.power_bonus.value, item.equippable.defense_bonus.value
+        )
+        self.parent.inventory.changed()
 
         if add_message:
             self.equip_message(item.name)
@@ -71,6 +88,8 @@ class Equipment(BaseComponent):
             self.unequip_message(current_item.name)
 
         setattr(self, slot, None)
+        self.parent.fighter.remove_modifier(slot)
+        self.parent.inventory.changed()
 
     def toggle_equip(self, equippable_item: Item, add_message: bool = True) -> None:
         if (
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
 
 import color
 import exceptions
@@ -12,6 +12,11 @@ if TYPE_CHECKING:
     from entity import Actor
 
 class Fighter(BaseComponent):
+    __slots__ = ("hp_attr", "base_defense", "base_power", "attributes", "modifiers", "_power", "_defense")
+
+    # Saves from before modifiers have none, the equipped items' are added back by Equipment.refresh_modifiers.
+    slot_defaults = {"modifiers": {}, "_power": None, "_defense": None}
+
     parent: Actor
 
     def __init__(self, hp: int, base_defense: int, base_power: int):
@@ -20,27 +25,47 @@ class Fighter(BaseComponent):
         self.base_power = PowerAttribute(base_power)
         self.attributes = [self.hp_attr, self.base_defense, self.base_power]
 
+        # Stat modifiers by source (an equipment slot, a buff, ...) as (power bonus, defense bonus).
+        self.modifiers: Dict[str, Tuple[int, int]] = {}
+        self._power: Optional[int] = None
+        self._defense: Optional[int] = None
+
     @property
     def power(self) -> int:
-        return self.base_power.value + self.power_bonus
+        if self._power is None:
+            self._power = self.base_power.value + self.power_bonus
+        return self._power
 
     @property
     def defense(self) -> int:
-        return self.base_defense.value + self.defense_bonus
+        if self._defense is None:
+            self._defense = self.base_defense.value + self.defense_bonus
+        return self._defense
 
     @property
     def power_bonus(self) -> int:
-        if self.parent.equipment:
-            return self.parent.equipment.defense_bonus
-        else:
-            return 0
+        return sum(power_bonus for power_bonus, _ in self.modifiers.values())
 
     @property
     def defense_bonus(self) -> int:
-        if self.parent.equipment:
-            return self.parent.equipment.power_bonus
-        else:
-            return 0
+        return sum(defense_bonus for _, defense_bonus in self.modifiers.values())
+
+    def invalidate_stats(self) -> None:
+        """Forget the cached derived stats, they will be recomputed on the next read."""
+        self._power = None
+        self._defense = None
+        if self.parent.table is not None:
+            self.parent.table.update_stats(self.parent)
+
+    def add_modifier(self, source: str, power_bonus: int = 0, defense_bonus: int = 0) -> None:
+        """Add or replace the stat modifier given by 'source'."""
+        self.modifiers[source] = (power_bonus, defense_bonus)
+        self.invalidate_stats()
+
+    def remove_modifier(self, source: str) -> None:
+        """Remove the stat modifier given by 'source', if there is one."""
+        if self.modifiers.pop(source, None) is not None:
+            self.invalidate_stats()
 
     def die(self) -> None:
         if self.engine.player is self.parent:
@@ -49,22 +74,27 @@ class Fighter(BaseComponent):
         else:
             death_message = f"{self.parent.name} is dead!"
             death_message_color = color.enemy_die
+
+        self.become_corpse()
+
+        self.engine.message_log.add_message(death_message, death_message_color)
+
+        self.engine.player.level.add_xp(self.parent.level.xp_given)
+
+    def become_corpse(self, add_message: bool = True) -> None:
+        """
+        Turn the owning actor into remains and scatter its inventory.
+        Does not announce the death or award experience, see die() and Engine.apply_damage().
+        """
         self.parent.char = "%"
         self.parent.color = (191, 0, 0)
         self.parent.blocks_movement = False
         self.parent.ai = None
 
-        if self.parent.inventory.items:
-            for i in range(len(self.parent.inventory.items)):
-                self.parent.inventory.drop(self.parent.inventory.items[0])
+        for item in list(self.parent.inventory.items):
+            self.parent.inventory.drop(item, add_message, count = item.count)
         self.parent.name = f"Remains of {self.parent.name}"
         self.parent.render_order = RenderOrder.CORPSE
-        self.parent.gamemap.remove_entity_id(self.parent.entity_id)
-        self.parent.gamemap.new_entity_id(self.parent)
-
-        self.engine.message_log.add_message(death_message, death_message_color)
-
-        self.engine.player.level.add_xp(self.parent.level.xp_given)
 
     def heal(self, amount: int) -> int:
         if self.hp_attr.value == self.hp_attr.max:
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import random
-from typing import List, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 from components.base_component import BaseComponent
 
@@ -9,26 +9,129 @@ if TYPE_CHECKING:
     from entity import Actor, Item
 
 class Inventory(BaseComponent):
+    """
+    The items carried by an actor.
+
+    Besides the 'items' the inventory keeps them grouped by name, so menus and the HUD read ready-made
+    views instead of counting items every frame. Both are dicts used as sets which keep insertion order, so
+    adding and removing an item takes the same time however much is carried. Change the contents only through
+    add and remove, and call changed when equipping or unequipping one of the items.
+    """
+    __slots__ = ("capacity", "items", "groups", "version", "_summary", "_entries")
+
+    slot_defaults = {"groups": None, "version": 0, "_summary": None, "_entries": None}
+
     parent: Actor
 
     def __init__(self, capacity: int):
         self.capacity = capacity
-        self.items: List[Item] = []
+        self.items: Dict[Item, None] = {}
+        self.groups: Dict[str, Dict[Item, None]] = {}    # Items by name, in the order the names were first added.
+        self.version = 0    # Changes whenever the items or which of them are equipped change.
+        self._summary: Optional[List[Tuple[str, int]]] = None
+        self._entries: Optional[List[Tuple[Item, bool]]] = None
+
+    def __setstate__(self, state: Any) -> None:
+        super().__setstate__(state)
+        if isinstance(self.items, list):    # Saved before items were kept in a dict.
+            self.items = dict.fromkeys(self.items)
+        if self.groups is not None:
+            self.groups = {name: dict.fromkeys(group) for name, group in self.groups.items()}
 
-    def drop(self, item: Item) -> None:
+    def regroup(self) -> None:
+        """Rebuild 'groups' from 'items', for inventories saved before it was kept."""
+        self.groups = {}
+        for item in self.items:
+            self.groups.setdefault(item.name, {})[item] = None
+        self.changed()
+
+    def stack_for(self, item: Item) -> Optional[Item]:
+        """Return the stack already in this inventory which 'item' would be added to, if any."""
+        group = self.groups.get(item.name)
+        if group and item.stackable:
+            first = next(iter(group))
+            if first.stackable:
+                return first
+        return None
+
+    def has_room_for(self, item: Item) -> bool:
+        """Return True if 'item' fits, each stack takes one of the 'capacity' places."""
+        return len(self.items) < self.capacity or self.stack_for(item) is not None
+
+    def add(self, item: Item) -> Item:
+        """Add 'item', merging it into an existing stack if it can, and return the item or stack it ended up in."""
+        stack = self.stack_for(item)
+        if stack is not None:
+            stack.count += item.count
+        else:
+            stack = item
+            item.parent = self
+            self.items[item] = None
+            self.groups.setdefault(item.name, {})[item] = None
+        self.changed()
+        return stack
+
+    def remove(self, item: Item) -> None:
+        """Remove 'item' with its whole stack."""
+        del self.items[item]
+        group = self.groups[item.name]
+        del group[item]
+        if not group:
+            del self.groups[item.name]
+        self.changed()
+
+    def take(self, item: Item, count: int = 1) -> Item:
+        """Take 'count' items off the stack 'item' and return them, removing the stack if none are left."""
+        if count >= item.count:
+            self.remove(item)
+            return item
+        self.changed()
+        return item.split(count)
+
+    def changed(self) -> None:
+        """Drop the cached views after the contents or the equipped items changed."""
+        self.version += 1
+        self._summary = self._entries = None
+
+    @property
+    def summary(self) -> List[Tuple[str, int]]:
+        """(name, count) of every group of unequipped items, as shown on the HUD."""
+        if self._summary is None:
+            equipment = self.parent.equipment
+            equipped = [item.name for item in (equipment.weapon, equipment.armor) if item is not None]
+            self._summary = [
+                (name, sum(item.count for item in group) - equipped.count(name))
+                for name, group in self.groups.items()
+                if sum(item.count for item in group) > equipped.count(name)
+            ]
+        return self._summary
+
+    @property
+    def entries(self) -> List[Tuple[Item, bool]]:
+        """(item, is equipped) of every item, in the order of 'items'."""
+        if self._entries is None:
+            equipment = self.parent.equipment
+            self._entries = [(item, equipment.item_is_equipped(item)) for item in self.items]
+        return self._entries
+
+    def drop(self, item: Item, add_message: bool = True, count: int = 1) -> None:
         """
         Removes an item from the inventory and restores it to the game map at the player's current location
+
+        Only 'count' items of a stack are dropped, the rest stay in the inventory.
         """
-        self.items.remove(item)
+        item = self.take(item, count)
         if item.equippable and self.parent.equipment.item_is_equipped(item):
-            self.parent.equipment.toggle_equip(item)
+            self.parent.equipment.toggle_equip(item, add_message)
         if self.parent.is_alive:
             item.place(self.parent.x, self.parent.y, self.gamemap)
-            self.engine.message_log.add_message(f"{'You' if self.parent.entity_id == 0 else self.parent.name}"
-                                                f" dropped {item.name}.")
+            if add_message:
+                self.engine.message_log.add_message(f"{'You' if self.parent.entity_id == 0 else self.parent.name}"
+                                                    f" dropped {item.display_name}.")
         else:
             dx, dy = random.randint(-1, 1), random.randint(-1, 1)
             item.place(self.parent.x + dx, self.parent.y + dy, self.gamemap)
-            self.engine.message_log.add_message(f"{'You' if self.parent.entity_id == 0 else self.parent.name}"
-                                                f" dropped {item.name}"
-                                                f" randomly about as {'you' if self.parent.entity_id == 0 else 'they'} died.")
+            if add_message:
+                self.engine.message_log.add_message(f"{'You' if self.parent.entity_id == 0 else self.parent.name}"
+                                                    f" dropped {item.display_name}"
+                                                    f" randomly about as {'you' if self.parent.entity_id == 0 else 'they'} died.")
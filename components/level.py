@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Level(BaseComponent):
+    __slots__ = ("current_level", "current_xp", "level_up_base", "level_up_factor", "xp_given")
+
     parent: Actor
 
     def __init__(
@@ -51,17 +53,25 @@ class Level(BaseComponent):
 
         self.current_level += 1
 
-    def increase_max_hp(self) -> None:
+    def increase_max_hp(self, amount: int = 20) -> None:
         self.engine.message_log.add_message("Your health improves!")
 
+        self.parent.fighter.hp_attr.new_max(self.parent.fighter.hp_attr.max + amount, True)
+
         self.increase_level()
 
-    def increase_power(self) -> None:
+    def increase_power(self, amount: int = 1) -> None:
         self.engine.message_log.add_message("You feel stronger!")
 
+        self.parent.fighter.base_power.add_to_value(amount)
+        self.parent.fighter.invalidate_stats()
+
         self.increase_level()
 
-    def increase_defense(self) -> None:
+    def increase_defense(self, amount: int = 1) -> None:
         self.engine.message_log.add_message("Your movements are getting swifter!")
 
-        self.increase_level()
\ No newline at end of file
+        self.parent.fighter.base_defense.add_to_value(amount)
+        self.parent.fighter.invalidate_stats()
+
+        self.increase_level()
@@ -1,12 +1,32 @@
 from __future__ import annotations
 
+import time
+from typing import Optional
+
 from engine import Engine
 from tcod import Console
 from entity import Actor, Entity
+import perf
 import render_standards
 import render_functions
+import save_format
+
+# Seconds between readings of the process's memory, reading it every frame would cost more than the rest.
+MEMORY_SAMPLE_INTERVAL = 1.0
+
+_memory: Optional[int] = None
+_memory_sampled_at = float("-inf")
 
-import lzma, pickle
+def milliseconds(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} ms"
+
+def sampled_memory() -> Optional[int]:
+    """Return perf.resident_memory(), read again at most every MEMORY_SAMPLE_INTERVAL seconds."""
+    global _memory, _memory_sampled_at
+    now = time.perf_counter()
+    if now - _memory_sampled_at >= MEMORY_SAMPLE_INTERVAL:
+        _memory, _memory_sampled_at = perf.resident_memory(), now
+    return _memory
 
 class DebugEngine(Engine):
     """
@@ -19,35 +39,40 @@ class DebugEngine(Engine):
     def update_fov(self) -> None:
         """Updates fov by making no tiles visible"""
 
-    def save_as(self, filename: str = "savegame.sav") -> None:
-        """Overrides super().save_as(), forces saving to 'debug.sav'"""
-        super().save_as("debug.sav")
+    def snapshot_save(
+            self, filename: str = "savegame.sav", compression: str = save_format.DEFAULT_COMPRESSION
+    ) -> save_format.SaveSnapshot:
+        """Overrides super().snapshot_save(), forces saving to 'debug.sav'"""
+        return super().snapshot_save("debug.sav", compression)
 
     def render(self, console: Console) -> None:
 
+        # Everything below is kept up to date elsewhere, nothing here scans the map.
+        actor_turns, dormant = perf.last_count("actor_turns"), perf.last_count("dormant_actors")
+        memory = sampled_memory()
         self.debug_info: dict = {
             "Turn Count": self.turn_counter,
             "Player Position": (self.player.x, self.player.y),
             "Entities on Game Map": len(self.game_map.entities),
-            "Actors on Game Map": len(list(self.game_map.actors)),
-            "Cursor Location": self.cursor_location
+            "Actors active/dormant": f"{actor_turns - dormant}/{dormant}",
+            "Cursor Location": self.cursor_location,
+            "Frame Time": milliseconds(perf.last_time("frame")),
+            "Frame Time p95": milliseconds(perf.timings["frame"].p95 if "frame" in perf.timings else 0.0),
+            "Turn Time": milliseconds(perf.last_time("turn")),
+            "  Action": milliseconds(perf.last_time("action")),
+            "  Entity Turns": milliseconds(perf.last_time("entity_turns")),
+            "  FOV": milliseconds(perf.last_time("fov")),
+            "Pathfinds This Turn": perf.last_count("pathfinds"),
+            "Resident Floors": f"{self.game_world.resident_floors}/{len(self.game_world.floors)}",
+            "Memory": f"{memory / 2 ** 20:.1f} MB" if memory is not None else "n/a",
+            "Last Save": milliseconds(perf.last_time("save.snapshot") + perf.last_time("save.write")),
         }
 
         self.game_map.render(console, debug_mode = True)
 
-        self.message_log.render(
-            console=console,
-            x=render_standards.message_log_x,
-            y=render_standards.message_log_y,
-            width=render_standards.message_log_width,
-            height=render_standards.message_log_height,
-        )
+        self.render_message_log(console)
 
-        render_functions.render_dungeon_level(
-            console=console,
-            dungeon_level=self.game_world.current_floor,
-            location=(1, 1)
-        )
+        self.render_dungeon_level(console)
 
         render_functions.render_debug_info_readout(
             console=console,
@@ -57,9 +82,3 @@ class DebugEngine(Engine):
             height = render_standards.screen_height,
             engine = self,
         )
-
-    def save_as(self, filename: str = "savegame.sav") -> None:
-        """Save this Engine instance as a compressed file."""
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
\ No newline at end of file
@@ -1,16 +1,20 @@
 from __future__ import annotations
 
-import lzma
-import pickle
-from typing import TYPE_CHECKING
+import time
+from typing import Dict, List, Optional, Sequence, TYPE_CHECKING, Union
 
+import numpy as np  # type: ignore
 from tcod.console import Console
 from tcod.map import compute_fov
 
+import autosave
 import exceptions
+import color
+import perf
 import render_standards
 from message_log import MessageLog
 import render_functions
+import save_format
 
 if TYPE_CHECKING:
     from entity import Actor
@@ -28,16 +32,132 @@ class Engine:
 
     turn_counter: int
 
+    # The file this engine was last loaded from or saved to, and the identity of that save, see save_format.
+    save_file: Optional[str] = None
+    save_id: Optional[str] = None
+
+    # When True, actors sharing an AI class take their turns together through BaseAI.perform_batch.
+    batch_ai: bool = False
+
+    # Off-screen consoles of the HUD panels by name, see panel.
+    panels: Optional[Dict[str, render_functions.CachedPanel]] = None
+
+    # Set when something on screen changed since the last frame, main then draws a whole new frame.
+    redraw: bool = True
+
+    def mark_redraw(self) -> None:
+        self.redraw = True
+
     def handle_entity_turns(self) -> None:
-        for entity in set(self.game_map.actors) - {self.player}:
-            if entity.ai:
+        self.game_map.dirty = True  # A turn passed on this floor.
+        self.mark_redraw()
+
+        if self.batch_ai:
+            actors_by_ai: Dict[type, List[Actor]] = {}
+            for entity in [actor for actor in self.game_map.actors if actor is not self.player]:
+                if entity.ai:
+                    actors_by_ai.setdefault(type(entity.ai), []).append(entity)
+            for ai_cls, actors in actors_by_ai.items():
+                with perf.phase(f"ai.{ai_cls.__name__}"):
+                    ai_cls.perform_batch(self, actors)
+                perf.count("actor_turns", len(actors))
+            return
+
+        timed = perf.enabled
+        actor_turns = 0
+        for entity in [actor for actor in self.game_map.actors if actor is not self.player]:
+            ai = entity.ai
+            if ai:
+                actor_turns += 1
+                if timed:
+                    start = time.perf_counter()
                 try:
-                    entity.ai.perform()
+                    ai.perform()
                 except exceptions.Impossible:
                     pass # Ignore impossible action exceptions from AI.
+                if timed:
+                    perf.accumulate(f"ai.{type(ai).__name__}", time.perf_counter() - start)
+        perf.count("actor_turns", actor_turns)
+
+    def apply_damage(
+            self,
+            targets: Sequence[Actor],
+            amount: Union[int, np.ndarray],
+            message: Optional[str] = None,
+            ignore_defense: bool = True,
+    ) -> List[Actor]:
+        """
+        Damage every actor in 'targets' at once and return the actors that were killed.
+
+        'amount' is either one value for all targets or an array with one value per target.
+        If 'ignore_defense' is False then the damage is reduced by defense the same way as a MeleeAction.
+        'message' is added to the log once for the whole batch, "{names}" and "{damage}" are filled in.
+        Deaths are resolved together and announced in a single message.
+        """
+        if not targets:
+            return []
+
+        count = len(targets)
+        table = self.game_map.actor_table
+        rows = table.rows_of(targets) if table is not None else None
+
+        if rows is not None:
+            hp = table.hp[rows].astype(np.int64)
+        else:
+            hp = np.fromiter((actor.fighter.hp_attr.value for actor in targets), dtype = np.int64, count = count)
+        hp_min = np.fromiter((actor.fighter.hp_attr.min for actor in targets), dtype = np.int64, count = count)
+        damage = np.broadcast_to(np.asarray(amount, dtype = np.int64), (count,))
+
+        if not ignore_defense:
+            if rows is not None:
+                defense = table.defense[rows].astype(np.int64)
+            else:
+                defense = np.fromiter((actor.fighter.defense for actor in targets), dtype = np.int64, count = count)
+            reduced = (np.minimum(1.0, damage / np.maximum(defense, 1)) * damage).astype(np.int64)
+            damage = np.where(defense > 0, reduced, damage)
+
+        new_hp = np.maximum(hp - damage, hp_min)
+        if rows is not None:
+            table.hp[rows] = new_hp
+        else:
+            for actor, value in zip(targets, new_hp.tolist()):
+                actor.fighter.hp_attr.new_value(value)
+
+        if message:
+            damage_text = str(damage[0]) if (damage == damage[0]).all() else f"{damage.min()}-{damage.max()}"
+            names = render_functions.describe_actors(targets)
+            self.message_log.add_message(message.format(names = names, damage = damage_text))
+
+        killed = [actor for actor, dead in zip(targets, (new_hp <= 0).tolist()) if dead and actor.is_alive]
+        if not killed:
+            return killed
+
+        player_killed = self.player in killed
+        enemies_killed = [actor for actor in killed if actor is not self.player]
+
+        # Read the names before they become "Remains of ...".
+        enemy_names = render_functions.describe_actors(enemies_killed)
+        xp_gained = sum(actor.level.xp_given for actor in enemies_killed)
+
+        for actor in killed:
+            actor.fighter.become_corpse(add_message = False)
+
+        if enemies_killed:
+            self.message_log.add_message(
+                f"{enemy_names} {'is' if len(enemies_killed) == 1 else 'are'} dead!", color.enemy_die
+            )
+        if player_killed:
+            self.message_log.add_message("You died!", color.player_die)
+
+        self.player.level.add_xp(xp_gained)
+
+        return killed
 
     def update_fov(self) -> None:
         """Recompute the visible area based on the player's point of view."""
+        self.game_map.follow(self.player.x, self.player.y)
+        self.mark_redraw()
+        perf.count("fov")
         self.game_map.visible[:] = compute_fov(
             self.game_map.tiles["transparent"],
             (self.player.x, self.player.y),
@@ -45,45 +165,83 @@ class Engine:
         )
         # If a tile is visible, it should be added to "explored"
 
-        self.game_map.explored |= self.game_map.visible
-
-    def render(self, console: Console) -> None:
-        self.game_map.render(console)
-
-        self.message_log.render(
-            console = console,
-            x = render_standards.message_log_x,
-            y = render_standards.message_log_y,
-            width = render_standards.message_log_width,
-            height = render_standards.message_log_height,
+        if (self.game_map.visible & ~self.game_map.explored).any():
+            self.game_map.explored |= self.game_map.visible
+            self.game_map.dirty = True
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state.pop("panels", None)   # Consoles are rebuilt on the first render after loading.
+        return state
+
+    def panel(self, name: str, width: int, height: int) -> render_functions.CachedPanel:
+        """Return the off-screen console of the HUD panel 'name', see render_functions.CachedPanel."""
+        if self.panels is None:
+            self.panels = {}
+        panel = self.panels.get(name)
+        if panel is None or (panel.console.width, panel.console.height) != (width, height):
+            panel = self.panels[name] = render_functions.CachedPanel(width, height)
+        return panel
+
+    def render_message_log(self, console: Console) -> None:
+        width, height = render_standards.message_log_width, render_standards.message_log_height
+        self.panel("log", width, height).render(
+            console, render_standards.message_log_x, render_standards.message_log_y, self.message_log.version,
+            lambda panel: self.message_log.render(console = panel, x = 0, y = 0, width = width, height = height),
         )
 
-        render_functions.render_dungeon_level(
-            console = console,
-            dungeon_level = self.game_world.current_floor,
-            location = (1, 1)
+    def render_dungeon_level(self, console: Console) -> None:
+        # Drawn over the map, so the map's background is kept.
+        label = f"Dungeon level: {self.game_world.current_floor}"
+        self.panel("level", len(label), 1).render(
+            console, 1, 1, label,
+            lambda panel: render_functions.render_dungeon_level(
+                console = panel, dungeon_level = self.game_world.current_floor, location = (0, 0)
+            ),
+            bg_alpha = 0.0,
         )
 
-        render_functions.render_inventory_screen(
-            console = console,
-            engine = self,
-            x = render_standards.inventory_x,
-            y = render_standards.inventory_y,
-            width = render_standards.inventory_width,
-            height = render_standards.inventory_height,
+    def render(self, console: Console) -> None:
+        self.game_map.render(console)
+
+        self.render_message_log(console)
+
+        self.render_dungeon_level(console)
+
+        self.panel("inventory", render_standards.inventory_width, render_standards.inventory_height).render(
+            console, render_standards.inventory_x, render_standards.inventory_y,
+            render_functions.inventory_screen_key(self),
+            lambda panel: render_functions.render_inventory_screen(
+                console = panel,
+                engine = self,
+                x = 0,
+                y = 0,
+                width = render_standards.inventory_width,
+                height = render_standards.inventory_height,
+            )
         )
 
-        render_functions.render_character_screen(
-            console = console,
-            engine = self,
-            x = render_standards.character_screen_x,
-            y = render_standards.character_screen_y,
-            width = render_standards.character_screen_width,
-            height = render_standards.character_screen_height
+        self.panel("character", render_standards.character_screen_width, render_standards.character_screen_height).render(
+            console, render_standards.character_screen_x, render_standards.character_screen_y,
+            render_functions.character_screen_key(self),
+            lambda panel: render_functions.render_character_screen(
+                console = panel,
+                engine = self,
+                x = 0,
+                y = 0,
+                width = render_standards.character_screen_width,
+                height = render_standards.character_screen_height
+            )
         )
 
-    def save_as(self, filename: str = "savegame.sav") -> None:
-        """Save this Engine instance as a compressed file."""
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
\ No newline at end of file
+    def snapshot_save(
+            self, filename: str = "savegame.sav", compression: str = save_format.DEFAULT_COMPRESSION
+    ) -> save_format.SaveSnapshot:
+        """Take a snapshot of this Engine to be written to a structured save file, see save_format."""
+        autosave.wait_for_pending()
+        with perf.phase("save.snapshot"):
+            return save_format.snapshot(self, filename, compression)
+
+    def save_as(self, filename: str = "savegame.sav", compression: str = save_format.DEFAULT_COMPRESSION) -> None:
+        """Save this Engine instance as a structured save file, see save_format."""
+        self.snapshot_save(filename, compression).write()
\ No newline at end of file
@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import copy
 import math
-from typing import Optional, Tuple, TypeVar, TYPE_CHECKING, Union, Type, List
+from typing import Any, Dict, Optional, Tuple, TypeVar, TYPE_CHECKING, Union, Type, List
 
 from render_order import RenderOrder
+from slotted import Slotted
 
 if TYPE_CHECKING:
+    from actor_table import ActorTable
     from components.ai import BaseAI
     from components.consumable import Consumable
     from components.equipment import Equipment
@@ -18,10 +20,11 @@ if TYPE_CHECKING:
 
 T = TypeVar("T", bound = "Entity")
 
-class Entity:
+class Entity(Slotted):
     """
     A generic object to represent players, enemies, items, etc.
     """
+    __slots__ = ("x", "y", "char", "color", "name", "blocks_movement", "render_order", "parent", "entity_id")
 
     parent: Union[GameMap, Inventory]
 
@@ -46,7 +49,7 @@ class Entity:
         if parent:
             # If parent isn't provided now then it will be set later.
             self.parent = parent
-            parent.entities.add(self)
+            parent.add_entity(self)
         self.entity_id = None
 
     @property
@@ -59,8 +62,8 @@ class Entity:
         clone.x = x
         clone.y = y
         clone.parent = gamemap
-        gamemap.entities.add(clone)
-        gamemap.new_entity_id(self)
+        gamemap.add_entity(clone)
+        gamemap.new_entity_id(clone)
 
         return clone
 
@@ -71,10 +74,10 @@ class Entity:
         if gamemap:
             if hasattr(self, "parent"):    # Possibly uninitialized.
                 if self.parent is self.gamemap:
-                    self.gamemap.entities.remove(self)
+                    self.gamemap.remove_entity(self)
                     self.gamemap.remove_entity_id(self.entity_id)
             self.parent = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
             gamemap.new_entity_id(self)
 
     def distance(self, x: int, y: int) -> float:
@@ -89,6 +92,20 @@ class Entity:
         self.y += dy
 
 class Actor(Entity):
+    """
+    An entity which can act and fight.
+
+    While the actor is in its GameMap's ActorTable ('table' is not None) its position lives in row 'row'
+    of the table, and the table is told about every change to its AI.
+    """
+    __slots__ = ("_ai", "equipment", "fighter", "inventory", "level", "table", "row")
+
+    slot_defaults = {"table": None, "row": 0}
+
+    # Entity's x and y slots, which hold the position while the actor is not in a table.
+    _x = Entity.x
+    _y = Entity.y
+
     def __init__(
             self,
             *,
@@ -103,6 +120,9 @@ class Actor(Entity):
             inventory: Inventory,
             level: Level
     ):
+        self.table: Optional[ActorTable] = None
+        self.row = 0
+
         super().__init__(
             x = x,
             y = y,
@@ -113,13 +133,14 @@ class Actor(Entity):
             render_order = RenderOrder.ACTOR,
         )
 
-        self.ai: Optional[BaseAI] = ai_cls(self)
+        self.ai = ai_cls(self)
 
         self.equipment: Equipment = equipment
         self.equipment.parent = self
 
         self.fighter = fighter
         self.fighter.parent = self
+        self.equipment.refresh_modifiers()
 
         self.inventory = inventory
         self.inventory.parent = self
@@ -127,6 +148,47 @@ class Actor(Entity):
         self.level = level
         self.level.parent = self
 
+    def __getstate__(self) -> Dict[str, Any]:
+        state = super().__getstate__()
+        state["_x"], state["_y"] = state.pop("x"), state.pop("y")   # Restored into the slots, not the table.
+        return state
+
+    @property
+    def x(self) -> int:
+        if self.table is None:
+            return self._x
+        return int(self.table.x[self.row])
+
+    @x.setter
+    def x(self, value: int) -> None:
+        if self.table is None:
+            self._x = value
+        else:
+            self.table.x[self.row] = value
+
+    @property
+    def y(self) -> int:
+        if self.table is None:
+            return self._y
+        return int(self.table.y[self.row])
+
+    @y.setter
+    def y(self, value: int) -> None:
+        if self.table is None:
+            self._y = value
+        else:
+            self.table.y[self.row] = value
+
+    @property
+    def ai(self) -> Optional[BaseAI]:
+        return self._ai
+
+    @ai.setter
+    def ai(self, value: Optional[BaseAI]) -> None:
+        self._ai = value
+        if self.table is not None:
+            self.table.update_ai(self)
+
     @property
     def attributes(self) -> List:
         return self.fighter.attributes
@@ -137,6 +199,15 @@ class Actor(Entity):
         return bool(self.ai)
 
 class Item(Entity):
+    """
+    An item, or a stack of 'count' identical items.
+
+    Consumables without an equippable part stack, see Inventory.add.
+    """
+    __slots__ = ("consumable", "equippable", "count")
+
+    slot_defaults = {"count": 1}
+
     def __init__(
             self,
             *,
@@ -166,4 +237,24 @@ class Item(Entity):
         self.equippable = equippable
 
         if self.equippable:
-            self.equippable.parent = self
\ No newline at end of file
+            self.equippable.parent = self
+
+        self.count = 1
+
+    @property
+    def stackable(self) -> bool:
+        return self.consumable is not None and self.equippable is None
+
+    @property
+    def display_name(self) -> str:
+        """The name of this item, with the size of the stack if there is more than one."""
+        return f"{self.name} (x{self.count})" if self.count > 1 else self.name
+
+    def split(self, count: int) -> Item:
+        """Take 'count' items off this stack and return them as a new stack with the same parent."""
+        clone = copy.copy(self)
+        clone.count, self.count = count, self.count - count
+        if self.consumable is not None:
+            clone.consumable = copy.copy(self.consumable)
+            clone.consumable.parent = clone
+        return clone
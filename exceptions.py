@@ -5,5 +5,11 @@ class Impossible(Exception):
     The reason is given as the exception message.
     """
 
+class InvalidSaveFile(Exception):
+    """Exception raised when a save file cannot be read, the reason is given as the exception message."""
+
+class InvalidReplayFile(Exception):
+    """Exception raised when a replay file cannot be read, the reason is given as the exception message."""
+
 class QuitWithoutSaving(SystemExit):
     """Can be raised to exit the game without automatically saving."""
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from typing import Optional, Iterator, Iterable, TYPE_CHECKING, Generator, Tuple, List
+from typing import Callable, Dict, Optional, Iterator, Iterable, TYPE_CHECKING, Generator, Tuple, List, Set, Union
 
 import numpy as np  # type: ignore
 from tcod.console import Console
 
 import exceptions
+import perf
+import scratch
+from actor_table import ActorTable
 from entity import Actor, Item
 import tile_types
 
@@ -17,31 +20,52 @@ if TYPE_CHECKING:
 class GameMap:
     parent: GameWorld
 
+    actor_table: Optional[ActorTable] = None
+    dirty: bool = True
+    use_memmap: bool = False
+
     def __init__(
             self, engine: Engine, width: int, height: int, tiling: int, entities: Iterable[Entity] = (),
-            fill_tile = tile_types.wall
+            fill_tile = tile_types.wall, use_actor_table: bool = False, use_memmap: bool = False
     ):
         self.engine = engine
         self.width, self.height, self.tiling = width, height, tiling
         self.tile_width, self.tile_height = self.width // self.tiling, self.height // self.tiling
-        self.entities = set(entities)
-        self.tiles = np.full((width, height), fill_value = fill_tile, order = "F")
-
-        self.visible = np.full(
-            (width, height), fill_value = False, order = "F"
-        ) # Tiles the player can currently see
-        self.explored = np.full(
-            (width, height), fill_value = False, order = "F"
-        )   # Tiles the player has seen before
-        self.tile_exists = np.full(
-            (width, height), fill_value = True, order = "F"
-        )
+
+        # Optional struct-of-arrays store for the hot fields of this map's actors.
+        self.actor_table = ActorTable() if use_actor_table else None
+        # Used as a set which keeps insertion order, so turns are taken in the same order every time.
+        self.entities: Dict[Entity, None] = {}
+        for entity in entities:
+            self.add_entity(entity)
+
+        # Optionally back the map arrays with files in the scratch directory, for floors too large for RAM.
+        self.use_memmap = use_memmap
+        self.tiles = self.new_array(fill_tile, "tiles")
+
+        self.visible = self.new_array(False, "visible")  # Tiles the player can currently see
+        self.explored = self.new_array(False, "explored")    # Tiles the player has seen before
+        self.tile_exists = self.new_array(True, "tile_exists")
 
         self.entity_ids: dict[int: Entity] = {}
 
+        # True when this map changed since it was last saved, see save_format.
+        self.dirty = True
+
         self.downstairs_location = (0, 0)
         self.upstairs_location = (0, 0)
 
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        if isinstance(self.entities, set):  # Saved before entities were kept in order.
+            self.entities = dict.fromkeys(self.entities)
+
+    def new_array(self, fill_value, name: str) -> np.ndarray:
+        """Return a new array the size of this map, in the scratch directory if this map uses memmaps."""
+        if self.use_memmap:
+            return scratch.full((self.width, self.height), fill_value, name)
+        return np.full((self.width, self.height), fill_value = fill_value, order = "F")
+
     @property
     def gamemap(self) -> GameMap:
         return self
@@ -56,6 +80,7 @@ class GameMap:
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this map's living actors"""
+        perf.count("entity_scans")
         yield from (
             entity
             for entity in self.entities
@@ -64,12 +89,29 @@ class GameMap:
 
     @property
     def items(self) -> Iterator[Item]:
+        perf.count("entity_scans")
         yield from(
             entity
             for entity in self.entities
             if isinstance(entity, Item)
         )
 
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map, moving actors into this map's ActorTable if it has one."""
+        self.entities[entity] = None
+        self.dirty = True
+        if self.actor_table is not None and isinstance(entity, Actor) and entity.table is not self.actor_table:
+            if entity.table is not None:
+                entity.table.remove(entity)
+            self.actor_table.add(entity)
+
+    def remove_entity(self, entity: Entity) -> None:
+        """Remove an entity from this map, and its row from this map's ActorTable."""
+        del self.entities[entity]
+        self.dirty = True
+        if isinstance(entity, Actor) and entity.table is not None and entity.table is self.actor_table:
+            self.actor_table.remove(entity)
+
     def new_entity_id(self, entity: Entity) -> bool:
         """Assigns entity IDs and dictionary space to an entity and return True, if Impossible return False"""
         try:
@@ -86,6 +128,7 @@ class GameMap:
     def get_blocking_entity_at_location(
             self, location_x: int, location_y: int
     ) -> Optional[Entity]:
+        perf.count("entity_scans")
         for entity in self.entities:
             if (
                     entity.blocks_movement
@@ -111,6 +154,14 @@ class GameMap:
         """Updates important map locations to stay consistent with their tiles"""
         self.tiles[self.upstairs_location] = tile_types.up_stairs
         self.tiles[self.downstairs_location] = tile_types.down_stairs
+        self.dirty = True
+
+    def entry_location(self, going_down: bool) -> Tuple[int, int]:
+        """Return where the player arrives on this map, by the upstairs if going down and the downstairs if not."""
+        return self.upstairs_location if going_down else self.downstairs_location
+
+    def follow(self, x: int, y: int) -> None:
+        """Called with the player's position after every turn, for maps which only keep part of themselves around."""
 
     def render(self, console: Console, debug_mode: bool = False) -> None:
         """
@@ -146,10 +197,168 @@ class GameMap:
                     entity.x % self.tile_width, entity.y % self.tile_height, entity.char, fg = entity.color
                 )
 
+class SurfaceChunk:
+    """What a ChunkedSurface keeps of a chunk which left its window and can't be generated again as it was."""
+    def __init__(self, tiles: Optional[np.ndarray], explored: Optional[np.ndarray], entities: List[Entity]):
+        self.tiles = tiles  # Only kept for pinned chunks.
+        self.explored = explored    # Packed bits, None if nothing in the chunk was explored.
+        self.entities = entities    # Positions of these entities are in world coordinates.
+
+
+class ChunkedSurface(GameMap):
+    """
+    Unbounded surface map made of chunks of tile_width by tile_height, generated from 'seed' when needed.
+
+    Only a window of tiling by tiling chunks is held in the map arrays, with the chunk at 'origin' (in world
+    chunk coordinates) in the top left corner. Entity positions and the rest of the GameMap API are relative to
+    the window, so nothing else needs to know about chunks.
+    Once the player leaves the center chunk of the window, follow moves the window so they are in the center
+    again: chunks entering it are generated from the seed or restored, and chunks leaving it are dropped unless
+    something in them can't be generated again, i.e. explored tiles, entities or tiles of a pinned chunk.
+    """
+
+    def __init__(
+            self, engine: Engine, chunk_width: int, chunk_height: int, tiling: int, seed: int,
+            entities: Iterable[Entity] = (), use_actor_table: bool = False
+    ):
+        super().__init__(
+            engine, chunk_width * tiling, chunk_height * tiling, tiling, entities,
+            fill_tile = tile_types.surface_floor, use_actor_table = use_actor_table
+        )
+        self.seed = seed
+        self.origin = (-(tiling // 2), -(tiling // 2))  # World chunk (0, 0) starts in the center.
+        self.chunks: Dict[Tuple[int, int], SurfaceChunk] = {}
+        self.pinned: Set[Tuple[int, int]] = set()
+
+        for slot_x in range(tiling):
+            for slot_y in range(tiling):
+                self.tiles[self.chunk_slices(slot_x, slot_y)] = self.generate_chunk(*self.world_chunk(slot_x, slot_y))
+
+    def chunk_slices(self, slot_x: int, slot_y: int) -> Tuple[slice, slice]:
+        """Return the part of the map arrays holding window slot (slot_x, slot_y)."""
+        return (
+            slice(slot_x * self.tile_width, (slot_x + 1) * self.tile_width),
+            slice(slot_y * self.tile_height, (slot_y + 1) * self.tile_height),
+        )
+
+    def world_chunk(self, slot_x: int, slot_y: int) -> Tuple[int, int]:
+        return self.origin[0] + slot_x, self.origin[1] + slot_y
+
+    def generate_chunk(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        from procgen import generate_surface_chunk
+
+        return generate_surface_chunk(self.seed, chunk_x, chunk_y, self.tile_width, self.tile_height)
+
+    def pin_chunk(self, x: int, y: int) -> None:
+        """Keep the tiles of the chunk holding (x, y) once it leaves the window, for tiles not made from the seed."""
+        self.pinned.add(self.world_chunk(x // self.tile_width, y // self.tile_height))
+
+    def update(self):
+        if self.in_bounds(*self.downstairs_location):
+            self.tiles[self.downstairs_location] = tile_types.down_stairs
+        self.dirty = True
+
+    def entry_location(self, going_down: bool) -> Tuple[int, int]:
+        # The downstairs may have been left behind by the window.
+        self.move_window(*self.downstairs_location)
+        return self.downstairs_location
+
+    def follow(self, x: int, y: int) -> None:
+        self.move_window(x, y)
+
+    def move_window(self, x: int, y: int) -> None:
+        """Move the window so the chunk holding (x, y) is in its center."""
+        shift_x = x // self.tile_width - self.tiling // 2
+        shift_y = y // self.tile_height - self.tiling // 2
+        if shift_x == 0 and shift_y == 0:
+            return
+        old_origin = self.origin
+        self.origin = (old_origin[0] + shift_x, old_origin[1] + shift_y)
+        offset_x, offset_y = shift_x * self.tile_width, shift_y * self.tile_height
+
+        # Entities follow the window, those ending up outside of it wait in their chunk in world coordinates.
+        leaving: Dict[Tuple[int, int], List[Entity]] = {}
+        for entity in list(self.entities):
+            new_x, new_y = entity.x - offset_x, entity.y - offset_y
+            path = getattr(getattr(entity, "ai", None), "path", None)
+            if self.in_bounds(new_x, new_y):
+                entity.x, entity.y = new_x, new_y
+                if path:
+                    entity.ai.path = [(path_x - offset_x, path_y - offset_y) for path_x, path_y in path]
+            else:
+                if path:
+                    entity.ai.path = []  # Found again from wherever the window is once it comes back into it.
+                self.remove_entity(entity)
+                entity.x += old_origin[0] * self.tile_width
+                entity.y += old_origin[1] * self.tile_height
+                leaving.setdefault((entity.x // self.tile_width, entity.y // self.tile_height), []).append(entity)
+
+        for slot_x in range(self.tiling):
+            for slot_y in range(self.tiling):
+                if not (0 <= slot_x - shift_x < self.tiling and 0 <= slot_y - shift_y < self.tiling):
+                    world = (old_origin[0] + slot_x, old_origin[1] + slot_y)
+                    self.store_chunk(self.chunk_slices(slot_x, slot_y), world, leaving.pop(world, []))
+
+        tiles, explored = np.empty_like(self.tiles), np.zeros_like(self.explored)
+        arriving: List[Entity] = []
+        for slot_x in range(self.tiling):
+            for slot_y in range(self.tiling):
+                region = self.chunk_slices(slot_x, slot_y)
+                if 0 <= slot_x + shift_x < self.tiling and 0 <= slot_y + shift_y < self.tiling:
+                    old_region = self.chunk_slices(slot_x + shift_x, slot_y + shift_y)
+                    tiles[region], explored[region] = self.tiles[old_region], self.explored[old_region]
+                    continue
+                world = self.world_chunk(slot_x, slot_y)
+                chunk = self.chunks.pop(world, None)
+                if chunk is None or chunk.tiles is None:
+                    tiles[region] = self.generate_chunk(*world)
+                else:
+                    tiles[region] = chunk.tiles
+                if chunk is not None:
+                    if chunk.explored is not None:
+                        explored[region] = np.unpackbits(
+                            chunk.explored, count = self.tile_width * self.tile_height
+                        ).reshape(self.tile_width, self.tile_height)
+                    arriving.extend(chunk.entities)
+
+        self.tiles, self.explored = tiles, explored
+        self.visible[:] = False
+        self.downstairs_location = (self.downstairs_location[0] - offset_x, self.downstairs_location[1] - offset_y)
+        for entity in arriving:
+            entity.x -= self.origin[0] * self.tile_width
+            entity.y -= self.origin[1] * self.tile_height
+            self.add_entity(entity)
+        self.dirty = True
+
+    def store_chunk(self, region: Tuple[slice, slice], world: Tuple[int, int], entities: List[Entity]) -> None:
+        """Keep what can't be generated again of the chunk in 'region', which is leaving the window."""
+        explored = self.explored[region]
+        chunk = SurfaceChunk(
+            self.tiles[region].copy(order = "F") if world in self.pinned else None,
+            np.packbits(explored) if explored.any() else None,
+            entities,
+        )
+        if chunk.tiles is not None or chunk.explored is not None or chunk.entities:
+            self.chunks[world] = chunk
+
+
+class LazyFloor:
+    """
+    Stand-in for a floor which has not been read from the save file yet.
+
+    'loader' reads the floor and returns it, GameWorld.get_floor calls it on first access.
+    """
+    def __init__(self, loader: Callable[[], GameMap]):
+        self.loader = loader
+
+
 class GameWorld:
     """
     Holds the settings for the GameMap, and generates new maps when moving down the stairs.
     """
+
+    use_actor_table: bool = False
+    use_memmap: bool = False
     def __init__(
             self,
             engine: Engine,
@@ -159,7 +368,9 @@ class GameWorld:
             max_rooms: int,
             room_min_size: int,
             room_max_size: int,
-            current_floor: int = 0
+            current_floor: int = 0,
+            use_actor_table: bool = False,
+            use_memmap: bool = False,
     ):
         self.engine = engine
 
@@ -174,7 +385,10 @@ class GameWorld:
 
         self.current_floor = current_floor
 
-        self.floors: List[GameMap] = []
+        self.use_actor_table = use_actor_table
+        self.use_memmap = use_memmap
+
+        self.floors: List[Union[GameMap, LazyFloor]] = []
 
     def generate_floor(self) -> None:
         from procgen import generate_dungeon, generate_surface
@@ -203,10 +417,25 @@ class GameWorld:
 
         self.floors.append(self.engine.game_map)
 
+    def get_floor(self, number: int) -> GameMap:
+        """Return the floor 'number', reading it from the save file first if it hasn't been yet."""
+        floor = self.floors[number]
+        if isinstance(floor, LazyFloor):
+            floor = floor.loader()
+            self.floors[number] = floor
+        return floor
+
+    @property
+    def resident_floors(self) -> int:
+        """Number of floors which have been read from the save file or generated."""
+        return sum(not isinstance(floor, LazyFloor) for floor in self.floors)
+
+    def load_all_floors(self) -> None:
+        """Read every floor which is still only in the save file."""
+        for number in range(len(self.floors)):
+            self.get_floor(number)
+
     def load_floor(self, going_down: bool) -> None:
-        self.engine.game_map = self.floors[self.current_floor]
-        if going_down:
-            new_position = self.engine.game_map.upstairs_location
-        else:
-            new_position = self.engine.game_map.downstairs_location
+        self.engine.game_map = self.get_floor(self.current_floor)
+        new_position = self.engine.game_map.entry_location(going_down)
         self.engine.player.place(new_position[0], new_position[1], self.engine.game_map)
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Run the game without a window, tileset or rendering.
+
+A Game drives an Engine through the same event handlers as the windowed game, so actions and key presses
+have the same effects, but nothing is drawn unless an off-screen console is given to render into.
+Nothing here needs a display, which is what benchmarks, bots and bulk simulations build on.
+"""
+from __future__ import annotations
+
+import random
+from typing import Optional
+
+import tcod
+
+import input_handlers
+import perf
+import render_standards
+import setup_game
+from actions import Action
+from engine import Engine
+
+
+class Game:
+    """
+    A headless game session.
+
+    'engine' defaults to a new game seeded with 'seed'. If 'console' is given, every step is rendered to it,
+    e.g. a tcod.Console(render_standards.screen_width, render_standards.screen_height, order = "F").
+    """
+
+    def __init__(
+            self, engine: Optional[Engine] = None, seed: Optional[int] = None, console: Optional[tcod.Console] = None
+    ):
+        if seed is not None:
+            random.seed(seed)
+        self.engine = engine if engine is not None else setup_game.new_game(history = False)
+        self.handler: input_handlers.BaseEventHandler = input_handlers.MainGameEventHandler(self.engine)
+        self.console = console
+
+    @property
+    def turn(self) -> int:
+        return self.engine.turn_counter
+
+    @property
+    def game_over(self) -> bool:
+        return not self.engine.player.is_alive
+
+    def perform(self, action: Action) -> bool:
+        """Perform 'action' for the player, return True if it took a turn."""
+        turn = self.engine.turn_counter
+        if isinstance(self.handler, input_handlers.EventHandler):
+            self.handler = self.handler.perform_action(action)
+        self.render()
+        return self.engine.turn_counter != turn
+
+    def press(self, sym: tcod.event.KeySym, mod: tcod.event.Modifier = tcod.event.Modifier.NONE) -> None:
+        """Handle a key press as if it came from the keyboard."""
+        self.handle_event(tcod.event.KeyDown(scancode = 0, sym = sym, mod = mod))
+
+    def handle_event(self, event: tcod.event.Event) -> None:
+        self.handler = self.handler.handle_events(event)
+        self.render()
+
+    def render(self) -> None:
+        """Render the current handler to the off-screen console, if there is one."""
+        if self.console is not None:
+            with perf.phase("render"):
+                self.console.clear()
+                self.handler.on_render(console = self.console)
+            self.handler.mark_rendered()
+
+
+def new_console() -> tcod.Console:
+    """Return an off-screen console the size of the game's screen."""
+    return tcod.Console(render_standards.screen_width, render_standards.screen_height, order = "F")
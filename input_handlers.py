@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import contextlib
 import os
 
-from typing import Callable, Tuple, Optional, TYPE_CHECKING, Union, Iterable
+from typing import Callable, ContextManager, Tuple, Optional, TYPE_CHECKING, Union, Iterable
 
 import tcod.event
 
 import actions
+import autosave
 import render_functions
 from actions import (
     Action,
@@ -18,7 +20,10 @@ from actions import (
 )
 import color
 import exceptions
+import perf
+import profiling
 import render_standards
+import telemetry
 
 if TYPE_CHECKING:
     from engine import Engine
@@ -83,6 +88,16 @@ MainGameEventHandler will become the active handler.
 
 
 class BaseEventHandler(tcod.event.EventDispatch[ActionOrHandler]):
+    # Set when this handler changed something on screen since it was last rendered, a new handler is always rendered.
+    redraw: bool = True
+
+    @property
+    def needs_redraw(self) -> bool:
+        return self.redraw
+
+    def mark_rendered(self) -> None:
+        self.redraw = False
+
     def handle_events(self, event: tcod.event.Event) -> BaseEventHandler:
         """Handle an event and return the next active event handler."""
         state = self.dispatch(event)
@@ -123,6 +138,10 @@ class PopupMessage(BaseEventHandler):
             alignment = tcod.CENTER
         )
 
+    @property
+    def needs_redraw(self) -> bool:
+        return self.redraw or self.parent.needs_redraw
+
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[BaseEventHandler]:
         """Any key returns to the parent handler."""
         return self.parent
@@ -132,13 +151,24 @@ class EventHandler(BaseEventHandler):
     def __init__(self, engine: Engine):
         self.engine = engine
 
+    @property
+    def needs_redraw(self) -> bool:
+        return self.redraw or self.engine.redraw
+
+    def mark_rendered(self) -> None:
+        self.redraw = self.engine.redraw = False
+
     def handle_events(self, event: tcod.event.Event) -> BaseEventHandler:
         """Handle events for input handlers with an engine."""
         action_or_state = self.dispatch(event)
         if isinstance(action_or_state, BaseEventHandler):
             return action_or_state
-        if self.handle_action(action_or_state):
-            self.engine.turn_counter += 1
+        return self.perform_action(action_or_state)
+
+    def perform_action(self, action: Optional[Action]) -> BaseEventHandler:
+        """Perform 'action' for the player and return the next active event handler."""
+        if self.handle_action(action):
+            self.count_turn()
             # A valid action was performed.
             if not self.engine.player.is_alive:
                 # THe player was killed sometime during or after the action.
@@ -148,6 +178,11 @@ class EventHandler(BaseEventHandler):
             return MainGameEventHandler(self.engine)   # Return to the main handler.
         return self
 
+    def count_turn(self) -> None:
+        """Count the turn taken by the action just handled, and record it in the telemetry."""
+        self.engine.turn_counter += 1
+        telemetry.turn(self.engine, self.engine.turn_counter)
+
     def handle_action(self, action: Optional[ActionOrHandler]) -> bool:
         """
         Handle actions returned from event methods.
@@ -157,15 +192,23 @@ class EventHandler(BaseEventHandler):
         if action is None:
             return False
 
-        try:
-            action.perform()
-        except exceptions.Impossible as exc:
-            self.engine.message_log.add_message(exc.args[0], color.impossible)
-            return False    # Skip enemy turn on exceptions
+        with perf.phase("action"):
+            try:
+                action.perform()
+            except exceptions.Impossible as exc:
+                self.engine.message_log.add_message(exc.args[0], color.impossible)
+                self.engine.mark_redraw()
+                return False    # Skip enemy turn on exceptions
+
+        self.engine.mark_redraw()
+
+        with perf.phase("entity_turns"):
+            self.engine.handle_entity_turns()
 
-        self.engine.handle_entity_turns()
+        with perf.phase("fov"):
+            self.engine.update_fov()
 
-        self.engine.update_fov()
+        perf.end_turn()
 
         return True
 
@@ -225,17 +268,60 @@ class DebugModeEventHandler(EventHandler):
 
     def __init__(self, engine: Engine):
         super().__init__(engine)
+        # Timing is on for the performance lines of the debug readout, and only while in debug mode.
+        self.perf_was_enabled = perf.enabled
+        perf.enable()
+        self.capture: Optional[profiling.Capture] = None
+
+    def leave(self) -> None:
+        """Leave debug mode, which quits the game."""
+        perf.enable(self.perf_was_enabled)
+        raise SystemExit()
 
-    def handle_events(self, event: tcod.event.Event) -> BaseEventHandler:
-        """Handle events for input handlers with an engine."""
-        action_or_state = self.dispatch(event)
-        if isinstance(action_or_state, BaseEventHandler):
-            return action_or_state
-        if self.handle_action(action_or_state):
-            self.engine.turn_counter += 1
-            return self
+    def ev_quit(self, event: tcod.event.Quit) -> Optional[ActionOrHandler]:
+        self.leave()
+
+    def perform_action(self, action: Optional[Action]) -> BaseEventHandler:
+        """Perform 'action' for the player, debug mode stays in this handler whatever happens."""
+        with self.profiled():
+            took_turn = self.handle_action(action)
+        if took_turn:
+            self.count_turn()
+            self.advance_capture("turns")
         return self
 
+    def on_render(self, console: tcod.Console) -> None:
+        with self.profiled():
+            super().on_render(console)
+        self.advance_capture("frames")
+
+    def profiled(self) -> ContextManager[None]:
+        """Return a context manager profiling its block if a capture is running."""
+        return self.capture.running() if self.capture is not None else contextlib.nullcontext()
+
+    def toggle_capture(self, unit: str) -> None:
+        """Start profiling the next turns or frames, or finish the running capture early."""
+        if self.capture is not None:
+            self.finish_capture()
+            return
+        self.capture = profiling.Capture(unit)
+        self.engine.message_log.add_message(f"Profiling the next {self.capture.length} {unit}.", color.white)
+        self.engine.mark_redraw()
+
+    def advance_capture(self, unit: str) -> None:
+        if self.capture is not None and self.capture.advance(unit):
+            self.finish_capture()
+
+    def finish_capture(self) -> None:
+        """Write the running capture and report its hottest functions in the message log."""
+        capture, self.capture = self.capture, None
+        stats_path, collapsed_path = capture.write()
+        log = self.engine.message_log
+        log.add_message(f"Profile written to {stats_path} and {collapsed_path}.", color.white)
+        for name, own_time, fraction in capture.hot_functions():
+            log.add_message(f"{own_time * 1000:8.1f} ms {fraction:4.0%} {name}", color.impossible)
+        self.engine.mark_redraw()
+
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[ActionOrHandler]:
 
         action: Optional[ActionOrHandler] = None
@@ -256,9 +342,11 @@ class DebugModeEventHandler(EventHandler):
         elif key in WAIT_KEYS:
             action = WaitAction(player)
         elif key == tcod.event.K_ESCAPE:
-            raise SystemExit
+            self.leave()
         elif key == tcod.event.K_SLASH:
             return LookHandler(self.engine, parent_handler = self)
+        elif key == tcod.event.K_p:    # Profile the next turns, or frames with shift.
+            self.toggle_capture("frames" if modifier & (tcod.event.KMOD_LSHIFT | tcod.event.KMOD_RSHIFT) else "turns")
 
         if key == tcod.event.K_PERIOD and modifier & (
             tcod.event.KMOD_LSHIFT | tcod.event.KMOD_RSHIFT
@@ -276,8 +364,11 @@ class GameOverEventHandler(EventHandler):
 
     def on_quit(self) -> None:
         """Handle exiting out of a finished game"""
+        autosave.wait_for_pending()    # Don't let an autosave recreate the file after it is deleted.
         if os.path.exists("savegame.sav"):
             os.remove("savegame.sav")   # Deletes the active save file
+        if self.engine.message_log.history_file and os.path.exists(self.engine.message_log.history_file):
+            os.remove(self.engine.message_log.history_file)
         print("Save Deleted.")
         raise exceptions.QuitWithoutSaving()    # Avoid saving a finished game
 
@@ -299,7 +390,7 @@ class HistoryViewer(EventHandler):
 
     def __init__(self, engine: Engine, previous_handler: EventHandler):
         super().__init__(engine)
-        self.log_length = len(engine.message_log.messages)
+        self.log_length = len(engine.message_log)
         self.cursor = self.log_length - 1
         self.previous_handler = previous_handler
 
@@ -314,18 +405,20 @@ class HistoryViewer(EventHandler):
             0, 0, log_console.width, 1, "~|Message History|~", alignment = tcod.CENTER
         )
 
-        # Render the message log using the cursor parameter.
+        # Render the message log using the cursor parameter, each message takes at least one line.
+        page_height = log_console.height - 2
         self.engine.message_log.render_messages(
             log_console,
             1,
             1,
             log_console.width - 2,
-            log_console.height - 2,
-            self.engine.message_log.messages[: self.cursor + 1],
+            page_height,
+            self.engine.message_log.history(max(0, self.cursor + 1 - page_height), self.cursor + 1),
         )
         log_console.blit(console, 3, 3)
 
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[BaseEventHandler]:
+        self.redraw = True
         # Fancy conditional movement to make it feel right.
         if event.sym in CURSOR_Y_KEYS:
             adjust = CURSOR_Y_KEYS[event.sym]
@@ -415,13 +508,13 @@ class CharacterScreenEventHandler(AskUserEventHandler):
             x = x + render_standards.padding_standard,
             y = y + render_standards.padding_standard + 4,
             string = f"Attack: {self.engine.player.fighter.base_power.value} + "
-                     f"{self.engine.player.equipment.power_bonus}"
+                     f"{self.engine.player.fighter.power_bonus}"
         )
         console.print(
             x = x + render_standards.padding_standard,
             y = y + render_standards.padding_standard + 5,
             string = f"Defense: {self.engine.player.fighter.base_defense.value} + "
-                     f"{self.engine.player.equipment.power_bonus}"
+                     f"{self.engine.player.fighter.defense_bonus}"
         )
 
 
@@ -465,6 +558,7 @@ class SelectScreenIndexHandler(AskUserEventHandler):
             x = max(0, min(x, self.engine.game_map.width - 1))
             y = max(0, min(y, self.engine.game_map.height - 1))
             self.engine.cursor_location = x, y
+            self.redraw = True
             return None
         elif key in CONFIRM_KEYS:
             return self.on_index_selected(*self.engine.cursor_location)
@@ -500,8 +594,10 @@ class OptionSelectionHandler(AskUserEventHandler):
         key = event.sym
         if key == tcod.event.K_UP:
             self.present_selection = max(0, self.present_selection - 1)
+            self.redraw = True
         elif key == tcod.event.K_DOWN:
             self.present_selection = min(len(self.selection) - 1, self.present_selection + 1)
+            self.redraw = True
         elif key in CONFIRM_KEYS:
             return self.confirm_selection()
         else:
@@ -558,14 +654,12 @@ class LevelUpEventHandler(OptionSelectionHandler):
         player = self.engine.player
 
         if self.present_selection == 0:
-            player.level.increase_max_hp()
-            player.fighter.hp_attr.new_max(player.fighter.hp_attr.max + 20, True)
+            player.level.increase_max_hp(20)
         elif self.present_selection == 1:
-            player.level.increase_power()
-            player.fighter.attributes[self.present_selection].add_to_value(1)
+            player.level.increase_power(1)
         else:
-            player.level.increase_defense()
-            player.fighter.attributes[self.present_selection].add_to_value(1)
+            player.level.increase_defense(1)
+        self.engine.mark_redraw()
 
         if not player.level.requires_level_up:
             return self.on_exit()
@@ -661,7 +755,7 @@ class InventoryEventHandler(OptionSelectionHandler):
         Will move to a different position based on where the player is located, they are.
         """
 
-        self.selection = list(enumerate(self.engine.player.inventory.items))
+        self.selection = list(enumerate(self.engine.player.inventory.entries))
 
         super().on_render(console)
         number_of_items_in_inventory = len(self.selection)
@@ -681,10 +775,8 @@ class InventoryEventHandler(OptionSelectionHandler):
         )
 
         if number_of_items_in_inventory > 0:
-            for i, item in self.selection:
-                is_equipped = self.engine.player.equipment.item_is_equipped(item)
-
-                item_string = f"{item.name}"
+            for i, (item, is_equipped) in self.selection:
+                item_string = f"{item.display_name}"
 
                 if is_equipped:
                     item_string = f"{item_string} (E)"
@@ -705,7 +797,8 @@ class InventoryEventHandler(OptionSelectionHandler):
         raise NotImplementedError
 
     def confirm_selection(self):
-        return self.on_item_selected(self.engine.player.inventory.items[self.present_selection])
+        item, _ = self.engine.player.inventory.entries[self.present_selection]
+        return self.on_item_selected(item)
 
 
 class InventoryActivateHandler(InventoryEventHandler):
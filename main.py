@@ -1,13 +1,25 @@
 #!\usr\bin\env python3
+import os
+import random
+import sys
+import time
 import traceback
+from typing import Iterable, List, Optional
 
 import tcod
 
+import autosave
 import color
 import exceptions
 import input_handlers
+import perf
 import setup_game
 import render_standards
+import replay
+import telemetry
+
+# The longest time spent handling a burst of events before drawing a frame, in seconds.
+COALESCE_TIME = 0.05
 
 def save_game(handler: input_handlers.BaseEventHandler, filename: str) -> None:
     """If the current event handler has an active Engine then save it."""
@@ -15,10 +27,44 @@ def save_game(handler: input_handlers.BaseEventHandler, filename: str) -> None:
         handler.engine.save_as(filename)
         print("Game saved.")
 
+def is_key_repeat_of(event: tcod.event.Event, previous: Optional[tcod.event.Event]) -> bool:
+    return (
+        isinstance(event, tcod.event.KeyDown) and event.repeat
+        and isinstance(previous, tcod.event.KeyDown) and (previous.sym, previous.mod) == (event.sym, event.mod)
+    )
+
+def coalesce(events: Iterable[tcod.event.Event], previous: Optional[tcod.event.Event] = None) -> List[tcod.event.Event]:
+    """
+    Keep only the last of each run of mouse motion events, nothing reacts to the ones in between.
+
+    A run of key repeats of a held down key is cut down to its first press, the rest piled up while the last frame
+    was drawn and acting on them would carry on moving the player after the key was let go. 'previous' is the last
+    event handled before these, if it was handled in the same frame.
+    """
+    result: List[tcod.event.Event] = []
+    for event in events:
+        if isinstance(event, tcod.event.MouseMotion) and result and isinstance(result[-1], tcod.event.MouseMotion):
+            result[-1] = event
+        elif is_key_repeat_of(event, result[-1] if result else previous):
+            continue
+        else:
+            result.append(event)
+    return result
+
 def main() -> None:
     screen_width = render_standards.screen_width
     screen_height = render_standards.screen_height
 
+    if os.environ.get("YANETS_TELEMETRY"):
+        telemetry.start(os.environ["YANETS_TELEMETRY"])
+
+    # Record the session to replay it later, see replay.
+    recorder: Optional[replay.Recorder] = None
+    if os.environ.get("YANETS_RECORD"):
+        seed = random.getrandbits(32)
+        random.seed(seed)
+        recorder = replay.Recorder(os.environ["YANETS_RECORD"], seed)
+
     tileset = tcod.tileset.load_tilesheet(
         "dejavu10x10_gs_tc.png", 32, 8, tcod.tileset.CHARMAP_TCOD
     )
@@ -33,29 +79,54 @@ def main() -> None:
         root_console = tcod.Console(screen_width, screen_height, order = "F")
 
         handler: input_handlers.BaseEventHandler = setup_game.MainMenu(root_console)
+        autosaver = autosave.Autosaver("savegame.sav", interval = 100)
 
         try:
             main_event_counter: int = 0
+            rendered_handler: Optional[input_handlers.BaseEventHandler] = None
             while True:
-                root_console.clear()
-                if isinstance(handler, setup_game.MainMenu):
-                    handler.on_render()
-                else:
-                    handler.on_render(console = root_console)
-                context.present(root_console)
+                # Only draw a frame when the handler changed or marked something to redraw, the whole frame is drawn then.
+                if handler is not rendered_handler or handler.needs_redraw:
+                    with perf.phase("frame"):
+                        with perf.phase("render"):
+                            root_console.clear()
+                            if isinstance(handler, setup_game.MainMenu):
+                                handler.on_render()
+                            else:
+                                handler.on_render(console = root_console)
+                        with perf.phase("present"):
+                            context.present(root_console)
+                    telemetry.frame(
+                        handler.engine.turn_counter if isinstance(handler, input_handlers.EventHandler) else None
+                    )
+                    handler.mark_rendered()
+                    rendered_handler = handler
 
                 try:
-                    for event in tcod.event.wait():
-                        context.convert_event(event)
-                        handler = handler.handle_events(event)
-                        main_event_counter += 1
+                    events = list(tcod.event.wait())
+                    deadline = time.perf_counter() + COALESCE_TIME
+                    event = None
+                    while events:
+                        for event in coalesce(events, previous = event):
+                            if isinstance(event, tcod.event.WindowEvent):
+                                rendered_handler = None # The window needs to be drawn again.
+                            context.convert_event(event)
+                            if recorder is not None:
+                                recorder.record(event)
+                            handler = handler.handle_events(event)
+                            main_event_counter += 1
+                        # Events which came in meanwhile, e.g. held down keys, are handled before the next frame.
+                        events = list(tcod.event.get()) if time.perf_counter() < deadline else []
+                    if isinstance(handler, input_handlers.EventHandler):
+                        autosaver.update(handler.engine)
                 except Exception:   # Handle exceptions in game.
                     traceback.print_exc()   # Print error to stderr.
-                    # Then print the error to the message log.
+                    # Then print the error itself to the message log, the traceback is too long for it.
                     if isinstance(handler, input_handlers.EventHandler):
                         handler.engine.message_log.add_message(
-                            traceback.format_exc(), color.error
+                            "".join(traceback.format_exception_only(*sys.exc_info()[:2])), color.error
                         )
+                        handler.engine.mark_redraw()
         except exceptions.QuitWithoutSaving:
             raise
         except SystemExit:  # Save and quit.
@@ -64,6 +135,9 @@ def main() -> None:
         except BaseException:   # Save on any other unexpected exception
             save_game(handler, "savegame.sav")
             raise
+        finally:
+            if recorder is not None:
+                recorder.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,4 +1,10 @@
-from typing import Iterable, List, Reversible, Tuple
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Reversible, Tuple
+import itertools
+import json
 import textwrap
 
 import tcod
@@ -8,11 +14,21 @@ import render_standards
 
 
 class Message:
+    # Wrapped lines of full_text by width, for the value of 'count' they were made with.
+    _wrapped: Optional[Dict[int, List[str]]] = None
+    _wrapped_count: int = 0
+
     def __init__(self, text: str, fg: Tuple[int, int, int]):
         self.plain_text = text
         self.fg = fg
         self.count = 1
 
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_wrapped", None)
+        state.pop("_wrapped_count", None)
+        return state
+
     @property
     def full_text(self) -> str:
         """The full text of this message, including the count if necessary."""
@@ -20,9 +36,63 @@ class Message:
             return f"{self.plain_text} (x{self.count})"
         return self.plain_text
 
+    def wrapped(self, width: int) -> List[str]:
+        """Return full_text wrapped to 'width', cached until 'count' changes it."""
+        if self._wrapped is None or self._wrapped_count != self.count:
+            self._wrapped, self._wrapped_count = {}, self.count
+        lines = self._wrapped.get(width)
+        if lines is None:
+            lines = self._wrapped[width] = list(MessageLog.wrap(self.full_text, width))
+        return lines
+
+    def to_json(self) -> bytes:
+        return json.dumps([self.plain_text, self.fg, self.count]).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, line: bytes) -> Message:
+        text, fg, count = json.loads(line)
+        message = cls(text, tuple(fg))
+        message.count = count
+        return message
+
 class MessageLog:
-    def __init__(self) -> None:
-        self.messages: List[Message] = []
+    """
+    The log of messages shown to the player.
+
+    Only the last 'capacity' messages are kept in 'messages', a ring buffer. Older ones are spilled to
+    'history_file' as a line of JSON each if there is one, and dropped otherwise. Each game needs a history file
+    of its own, the file is only ever appended to.
+    len() and history() cover every message still available, spilled or not.
+    """
+
+    capacity: int = 1000
+    history_file: Optional[str] = None
+    version: int = 0    # Changes with every message added, including stacked ones.
+    _layout: Optional[Tuple[Tuple[int, int, int], List[Tuple[int, str, Tuple[int, int, int]]]]] = None
+
+    def __init__(self, capacity: int = 1000, history_file: Optional[str] = None) -> None:
+        self.capacity = capacity
+        self.history_file = history_file
+        self.messages: Deque[Message] = deque(maxlen = capacity)
+        self.history_offsets = array("q")   # Where each spilled message starts in history_file.
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_layout", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if not isinstance(self.messages, deque):    # Saved before the log was a ring buffer.
+            self.messages = deque(self.messages, maxlen = self.capacity)
+            self.history_offsets = array("q")
+
+    def missing_message(self) -> Message:
+        """Stand in for a spilled message which is no longer in the history file."""
+        return Message(f"[Message missing from {self.history_file}]", color.error)
+
+    def __len__(self) -> int:
+        return len(self.history_offsets) + len(self.messages)
 
     def add_message(
             self, text: str, fg: Tuple[int, int, int] = color.white, *, stack: bool = True,
@@ -31,11 +101,39 @@ class MessageLog:
         'text' is the message text, 'fg' is the text color.
         If 'stack' is True then the message can stack with a previous message of the same text.
         """
+        self.version += 1
         if stack and self.messages and text == self.messages[-1].plain_text:
             self.messages[-1].count += 1
         else:
+            if len(self.messages) == self.capacity:
+                self.spill(self.messages[0])
             self.messages.append(Message(text, fg))
 
+    def spill(self, message: Message) -> None:
+        """Append 'message', which is about to leave the ring buffer, to the history file."""
+        if self.history_file is None:
+            return
+        with open(self.history_file, "ab") as f:
+            self.history_offsets.append(f.tell())
+            f.write(message.to_json() + b"\n")
+
+    def history(self, start: int, stop: int) -> List[Message]:
+        """Return messages 'start' to 'stop' of the whole log, reading spilled ones back from the history file."""
+        spilled = len(self.history_offsets)
+        messages = []
+        if start < spilled:
+            offsets = self.history_offsets[start:stop]
+            try:
+                with open(self.history_file, "rb") as f:
+                    for offset in offsets:
+                        f.seek(offset)
+                        line = f.readline()
+                        messages.append(Message.from_json(line) if line else self.missing_message())
+            except FileNotFoundError:
+                messages = [self.missing_message() for _ in offsets]
+        messages.extend(itertools.islice(self.messages, max(start - spilled, 0), max(stop - spilled, 0)))
+        return messages
+
     def render(
             self, console: tcod.Console, x: int, y: int, width: int, height: int,
    ) -> None:
@@ -53,7 +151,11 @@ class MessageLog:
             bg = color.black,
             clear = True
         )
-        self.render_messages(console, x + 1, y + 1, width - 2, height - 2, self.messages)
+        # The layout only changes when a message is added.
+        key = (width, height, self.version)
+        if self._layout is None or self._layout[0] != key:
+            self._layout = key, self.layout_messages(width - 2, height - 2, self.messages)
+        self.print_layout(console, x + 1, y + 1, self._layout[1])
 
     @staticmethod
     def wrap(string: str, width: int) -> Iterable[str]:
@@ -77,10 +179,26 @@ class MessageLog:
         The 'messages' are rendered starting at the last message and working
         backwards.
         """
+        cls.print_layout(console, x, y, cls.layout_messages(width, height, messages))
+
+    @staticmethod
+    def layout_messages(
+            width: int, height: int, messages: Reversible[Message],
+    ) -> List[Tuple[int, str, Tuple[int, int, int]]]:
+        """Return the (y offset, line, color) of every line of 'messages' which fits, from the bottom up."""
+        layout = []
         y_offset = height - 1
         for message in reversed(messages):
-            for line in reversed(list(cls.wrap(message.full_text, width))):
-                console.print(x = x, y = y + y_offset, string = line, fg = message.fg)
-                y_offset -= 1
+            for line in reversed(message.wrapped(width)):
                 if y_offset < 0:
-                    return # No more space to print messages
\ No newline at end of file
+                    return layout   # No more space to print messages
+                layout.append((y_offset, line, message.fg))
+                y_offset -= 1
+        return layout
+
+    @staticmethod
+    def print_layout(
+            console: tcod.Console, x: int, y: int, layout: Iterable[Tuple[int, str, Tuple[int, int, int]]],
+    ) -> None:
+        for y_offset, line, fg in layout:
+            console.print(x = x, y = y + y_offset, string = line, fg = fg)
\ No newline at end of file
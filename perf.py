@@ -0,0 +1,202 @@
+"""
+Timers and counters for the phases of a turn and of a frame.
+
+Timing is off unless enabled, e.g. by setting the YANETS_PERF environment variable. While off, phase() hands out
+one shared context manager which does nothing and count() returns straight away, so instrumented code costs
+about a function call. Every timer and counter keeps a rolling window of its latest samples to report
+p50/p95/max over, see Rolling.
+
+A turn is measured as the phases "action", "entity_turns" and "fov", recorded by EventHandler.handle_action,
+and a frame as "render" and "present", recorded by main along with "frame" spanning both. Time accumulated
+with accumulate(), e.g. per AI class, and the counters are recorded as one sample per turn by end_turn().
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import sys
+import time
+from collections import deque
+from typing import ContextManager, Deque, Dict, List, Optional
+
+# Number of samples the rolling statistics are taken over.
+WINDOW = 240
+
+TURN_PHASES = ("action", "entity_turns", "fov")
+
+enabled = bool(os.environ.get("YANETS_PERF"))
+
+
+class Rolling:
+    """The latest samples of one timer or counter."""
+    __slots__ = ("samples", "total")
+
+    def __init__(self, window: Optional[int] = WINDOW):
+        self.samples: Deque[float] = deque(maxlen = window)   # Every sample if 'window' is None.
+        self.total = 0.0    # Sum of every sample ever added, not only those in the window.
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self.total += value
+
+    def percentile(self, fraction: float) -> float:
+        """Return the nearest rank percentile of the window, 0 if it is empty."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def last(self) -> float:
+        return self.samples[-1] if self.samples else 0.0
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(0.5)
+
+    @property
+    def p95(self) -> float:
+        return self.percentile(0.95)
+
+    @property
+    def max(self) -> float:
+        return max(self.samples, default = 0.0)
+
+
+_window: Optional[int] = WINDOW
+
+# Timings in seconds and counts per turn by name.
+timings: Dict[str, Rolling] = {}
+counts: Dict[str, Rolling] = {}
+
+# Time and counts gathered during the current turn, recorded by end_turn().
+_pending_time: Dict[str, float] = {}
+_pending_counts: Dict[str, int] = {}
+
+# The timings and counts recorded by the latest end_turn(), only holding what was measured in that turn.
+turn_timings: Dict[str, float] = {}
+turn_counts: Dict[str, int] = {}
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        record(self.name, time.perf_counter() - self.start)
+
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def enable(on: bool = True) -> None:
+    global enabled
+    enabled = on
+
+
+def reset(window: Optional[int] = WINDOW) -> None:
+    """Forget every sample, and keep the latest 'window' samples of each timer and counter from now on."""
+    global _window
+    _window = window
+    timings.clear()
+    counts.clear()
+    _pending_time.clear()
+    _pending_counts.clear()
+    turn_timings.clear()
+    turn_counts.clear()
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Return a context manager recording how long its block took as a sample of the timer 'name'."""
+    return _Phase(name) if enabled else _NOT_TIMED
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a sample to the timer 'name'."""
+    rolling = timings.get(name)
+    if rolling is None:
+        rolling = timings[name] = Rolling(_window)
+    rolling.add(seconds)
+
+
+def accumulate(name: str, seconds: float) -> None:
+    """Add to the time spent on 'name' this turn, recorded as one sample by end_turn()."""
+    _pending_time[name] = _pending_time.get(name, 0.0) + seconds
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add to the counter 'name' for this turn."""
+    if enabled:
+        _pending_counts[name] = _pending_counts.get(name, 0) + amount
+
+
+def end_turn() -> None:
+    """Record the time accumulated and the counts of this turn, and the total time of its phases."""
+    if not enabled:
+        return
+    turn_timings.clear()
+    turn_timings.update((name, timings[name].last) for name in TURN_PHASES if name in timings)
+    turn_timings["turn"] = sum(turn_timings.values())
+    turn_timings.update(_pending_time)
+    for name, seconds in turn_timings.items():
+        if name not in TURN_PHASES:
+            record(name, seconds)
+    # Counters seen before but not this turn still get a sample, of zero.
+    turn_counts.clear()
+    for name in counts.keys() | _pending_counts.keys():
+        rolling = counts.get(name)
+        if rolling is None:
+            rolling = counts[name] = Rolling(_window)
+        turn_counts[name] = _pending_counts.get(name, 0)
+        rolling.add(turn_counts[name])
+    _pending_time.clear()
+    _pending_counts.clear()
+
+
+def last_time(name: str) -> float:
+    """Return the latest sample of the timer 'name' in seconds, 0 if it has none."""
+    rolling = timings.get(name)
+    return rolling.last if rolling is not None else 0.0
+
+
+def last_count(name: str) -> int:
+    """Return the count of 'name' in the latest turn."""
+    rolling = counts.get(name)
+    return int(rolling.last) if rolling is not None else 0
+
+
+def resident_memory() -> Optional[int]:
+    """
+    Return the memory used by this process in bytes.
+
+    Where the current resident size can't be read the peak is returned instead, and None without either.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024   # Bytes on macOS, kilobytes elsewhere.
+
+
+def report() -> List[str]:
+    """Return one line per timer and counter with its p50, p95 and max."""
+    lines = [
+        f"{name:20} p50 {rolling.p50 * 1000:8.3f} ms  p95 {rolling.p95 * 1000:8.3f} ms  max {rolling.max * 1000:8.3f} ms"
+        for name, rolling in sorted(timings.items())
+    ]
+    lines += [
+        f"{name:20} p50 {rolling.p50:8.0f}     p95 {rolling.p95:8.0f}     max {rolling.max:8.0f}"
+        for name, rolling in sorted(counts.items())
+    ]
+    return lines
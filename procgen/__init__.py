@@ -4,7 +4,7 @@ import random
 from typing import Dict, Tuple, List, TYPE_CHECKING
 
 import entity_factories
-from game_map import GameMap, GameWorld
+from game_map import ChunkedSurface, GameMap, GameWorld
 import tile_types
 import render_standards as rs
 import numpy as np
@@ -114,7 +114,8 @@ def generate_dungeon(parent_world: GameWorld, max_rooms: int, room_min_size: int
     map_width *= map_tiling
     map_height *= map_tiling
     player = engine.player
-    dungeon = GameMap(engine, map_width, map_height, map_tiling, entities = [player])
+    dungeon = GameMap(engine, map_width, map_height, map_tiling, entities = [player],
+                      use_actor_table = parent_world.use_actor_table, use_memmap = parent_world.use_memmap)
     dungeon.parent = parent_world
     rooms: List[RectangularRoom] = []
 
@@ -171,23 +172,46 @@ def generate_surface(parent_world: GameWorld, entrance_size: int, map_width: int
                      map_height: int, map_tiling: int, engine: Engine) -> GameMap:
     """
     Generates surface layer and entrance
+
+    The surface is a ChunkedSurface of map_width by map_height chunks, the player starts in world chunk (0, 0)
+    and the entrance structure is placed in one of the chunks around it that the window holds, or next to the
+    player in their own chunk when the window is only that chunk.
     """
-    map_width *= map_tiling
-    map_height *= map_tiling
     player = engine.player
-    surface = GameMap(engine, map_width, map_height, map_tiling, entities=[player], fill_tile=tile_types.surface_floor)
+    surface = ChunkedSurface(engine, map_width, map_height, map_tiling, seed=random.getrandbits(32),
+                             entities=[player], use_actor_table=parent_world.use_actor_table)
     surface.parent = parent_world
 
-    start_x = random.choice([10, map_width - 10])
-    start_y = random.choice([10, map_height - 10])
+    center = map_tiling // 2
+    start_x = center * map_width + random.choice([10, map_width - 10])
+    start_y = center * map_height + random.choice([10, map_height - 10])
 
     player.place(start_x, start_y, surface)
-
-    generate_structure(surface, random.randint(55, map_width - 55), random.randint(55, map_height - 55),
-                       random.randint(30, 50), random.randint(30, 50))
+    surface.tiles[start_x, start_y] = tile_types.surface_floor
+    surface.pin_chunk(start_x, start_y)
+
+    # A chunk next to the player's inside the window, or the player's own if the window is a single chunk.
+    structure_x, structure_y = random.choice([
+        (dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+        if (dx or dy) and 0 <= center + dx < map_tiling and 0 <= center + dy < map_tiling
+    ] or [(0, 0)])
+    while True:
+        width, height = random.randint(30, 50), random.randint(30, 50)
+        corner_x = (center + structure_x) * map_width + random.randint(0, map_width - width)
+        corner_y = (center + structure_y) * map_height + random.randint(0, map_height - height)
+        if not (corner_x <= start_x < corner_x + width and corner_y <= start_y < corner_y + height):
+            break
+    generate_structure(surface, corner_x, corner_y, width, height)
+    surface.pin_chunk(corner_x, corner_y)
 
     return surface
 
+def generate_surface_chunk(seed: int, chunk_x: int, chunk_y: int, width: int, height: int) -> np.ndarray:
+    """
+    Generates the tiles of one surface chunk, open floor around the structures placed by generate_surface
+    """
+    return np.full((width, height), fill_value=tile_types.surface_floor, order="F")
+
 def generate_structure(game_map: GameMap, corner_x: int, corner_y: int, width: int, height: int) -> None:
     """
     Generates structures of continuous walls
@@ -25,7 +25,9 @@ class Structure:
     def make_binary_partition(self, percent_floor: float, percent_variation: float, partition_depth: int,
                               partition_runs: int = 1, deeper_partitions: bool = False) -> None:
         self.blueprint = tcod.bsp.BSP(0, 0, self.width, self.height)
-        self.blueprint.split_recursive(partition_depth, 5, 5, 1.5, 1.5)
+        # Seeded from the random module, so a seeded game generates the same structure every time.
+        seed = tcod.random.Random(tcod.random.MERSENNE_TWISTER, random.getrandbits(32))
+        self.blueprint.split_recursive(partition_depth, 5, 5, 1.5, 1.5, seed = seed)
 
         # Generate rooms and connections
         for node in self.blueprint.post_order():
@@ -0,0 +1,119 @@
+"""
+On-demand cProfile captures of the running game, started from DebugModeEventHandler.
+
+A Capture only profiles the code run inside running(), i.e. handling the player's action and the turns after it
+and drawing frames, so time spent waiting for input doesn't show up. When it's done it writes the pstats file and
+a collapsed-stack file, which flamegraph.pl or speedscope turn into a flame graph.
+"""
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import os
+import pstats
+import time
+from typing import Dict, Iterator, List, Tuple
+
+PROFILE_DIRECTORY = "profiles"
+
+# How many turns or frames a capture spans unless stopped early.
+DEFAULT_LENGTH = {"turns": 20, "frames": 60}
+
+# A function as keyed in pstats: (file name, line number, function name).
+Function = Tuple[str, int, str]
+
+
+def label(function: Function) -> str:
+    """Return a short name for 'function', e.g. 'perform (ai.py:138)'."""
+    filename, line, name = function
+    if filename == "~":    # Built in.
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats, max_depth: int = 100) -> Dict[str, int]:
+    """
+    Return the time spent in every stack of 'stats' in microseconds, keyed by its functions joined with ';'.
+
+    cProfile only records callers one level up, so the stacks are rebuilt by walking down from the functions
+    nobody called, splitting the time of a function among its callers by how much of it each was responsible for.
+    Recursive calls end the stack, with their own time counted as a leaf.
+    """
+    raw = stats.stats    # type: ignore  # {function: (primitive calls, calls, own time, total time, callers)}
+    callees: Dict[Function, List[Function]] = {}
+    for function, (_, _, _, _, callers) in raw.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(function)
+
+    result: Dict[str, int] = {}
+
+    def visit(function: Function, stack: List[Function], own_time: float, total_time: float) -> None:
+        stack = stack + [function]
+        key = ";".join(label(frame) for frame in stack)
+        result[key] = result.get(key, 0) + round(own_time * 1e6)
+
+        function_total = raw[function][3]
+        if function_total <= 0 or len(stack) >= max_depth:
+            return
+        share = total_time / function_total    # How much of this function's time this stack accounts for.
+        for callee in callees.get(function, []):
+            _, _, edge_own, edge_total = raw[callee][4][function]
+            if callee in stack:
+                leaf = f"{key};{label(callee)}"
+                result[leaf] = result.get(leaf, 0) + round(edge_own * share * 1e6)
+                continue
+            visit(callee, stack, edge_own * share, edge_total * share)
+
+    for function, (_, _, own_time, total_time, callers) in raw.items():
+        if not callers:
+            visit(function, [], own_time, total_time)
+
+    return {stack: microseconds for stack, microseconds in result.items() if microseconds > 0}
+
+
+class Capture:
+    """A profile of the next 'length' turns or frames, 'unit' being "turns" or "frames"."""
+
+    def __init__(self, unit: str = "turns", length: int = 0, directory: str = PROFILE_DIRECTORY):
+        self.unit = unit
+        self.length = length or DEFAULT_LENGTH[unit]
+        self.remaining = self.length
+        self.directory = directory
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.unit}"
+        self.profiler = cProfile.Profile()
+
+    @contextlib.contextmanager
+    def running(self) -> Iterator[None]:
+        """Profile the code run in this block."""
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def advance(self, unit: str) -> bool:
+        """Count one turn or frame, return True once the capture has spanned all of them."""
+        if unit == self.unit:
+            self.remaining -= 1
+        return self.remaining <= 0
+
+    def write(self) -> Tuple[str, str]:
+        """Write the pstats and collapsed-stack files, return their paths."""
+        os.makedirs(self.directory, exist_ok = True)
+        stats_path = os.path.join(self.directory, f"{self.name}.prof")
+        collapsed_path = os.path.join(self.directory, f"{self.name}.collapsed")
+
+        stats = pstats.Stats(self.profiler)
+        stats.dump_stats(stats_path)
+        with open(collapsed_path, "w") as f:
+            for stack, microseconds in sorted(collapsed_stacks(stats).items()):
+                f.write(f"{stack} {microseconds}\n")
+
+        return stats_path, collapsed_path
+
+    def hot_functions(self, count: int = 5) -> List[Tuple[str, float, float]]:
+        """Return (name, own time, fraction of all time) of the 'count' functions with the most time of their own."""
+        raw = pstats.Stats(self.profiler).stats    # type: ignore
+        total = sum(own_time for _, _, own_time, _, _ in raw.values()) or 1.0
+        hottest = sorted(raw.items(), key = lambda item: item[1][2], reverse = True)[:count]
+        return [(label(function), own_time, own_time / total) for function, (_, _, own_time, _, _) in hottest]
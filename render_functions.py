@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Tuple, TYPE_CHECKING, Iterable
+from typing import Any, Callable, Tuple, TYPE_CHECKING, Iterable
 
 import color
 import textwrap
@@ -8,21 +8,55 @@ import textwrap
 import render_standards
 import render_standards as r_std
 
+from tcod import Console
+
 if TYPE_CHECKING:
-    from tcod import Console
     from engine import Engine
     from debug_engine import DebugEngine
+    from entity import Actor
     from game_map import GameMap
 
+class CachedPanel:
+    """
+    Off-screen console holding one HUD panel.
+
+    The panel is only drawn again when the key describing everything it shows changes, otherwise the
+    console from last time is blitted as it is.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.console = Console(width, height, order = "F")
+        self.key: Any = None
+
+    def render(
+            self, console: Console, x: int, y: int, key: Any, draw: Callable[[Console], None], bg_alpha: float = 1.0
+    ) -> None:
+        if self.key is None or key != self.key:
+            self.console.clear()
+            draw(self.console)
+            self.key = key
+        self.console.blit(console, x, y, bg_alpha = bg_alpha)
+
 def get_names_at_location(x: int, y: int, game_map: GameMap) -> str:
     if not game_map.in_bounds(x, y) or not game_map.visible[x, y]:
         return ""
     names = ", ".join(
-        entity.name for entity in game_map.entities if entity.x == x and entity.y == y
+        getattr(entity, "display_name", entity.name) for entity in game_map.entities if entity.x == x and entity.y == y
     )
 
     return names.capitalize()
 
+def describe_actors(actors: Iterable[Actor]) -> str:
+    """Return the names of 'actors' as one readable list, stacking repeated names, e.g. "Orc (x2) and Troll"."""
+    counts = {}
+    for actor in actors:
+        counts[actor.name] = counts.get(actor.name, 0) + 1
+
+    names = [name if count == 1 else f"{name} (x{count})" for name, count in counts.items()]
+    if len(names) <= 1:
+        return "".join(names)
+    return f"{', '.join(names[:-1])} and {names[-1]}"
+
 def render_bar(
         console: Console, x: int, y: int, current_value: int, maximum_value: int, total_width: int, name: str = "HP",
 ) -> None:
@@ -82,17 +116,12 @@ def render_inventory_screen(
     )
 
     if not in_use:
-        inventory_dict = {}
-        for instance in engine.player.inventory.items:
-            if not engine.player.equipment.item_is_equipped(instance):
-                inventory_dict[instance.name] = inventory_dict.get(instance.name, 0) + 1
-
-        for i, instance in enumerate(inventory_dict.keys()):
-            text = instance.ljust(r_std.readout_left_width)[:r_std.readout_left_width]
+        for i, (name, count) in enumerate(engine.player.inventory.summary):
+            text = name.ljust(r_std.readout_left_width)[:r_std.readout_left_width]
             console.print(
                 x = x + r_std.padding_standard,
                 y = y + r_std.padding_standard + i,
-                string = f"{text}:{str(inventory_dict[instance]).rjust(r_std.data_width)[:r_std.data_width]}",
+                string = f"{text}:{str(count).rjust(r_std.data_width)[:r_std.data_width]}",
                 fg = color.menu_text,
             )
 
@@ -104,6 +133,19 @@ def render_inventory_screen(
             bg=color.white
         )
 
+def inventory_screen_key(engine: Engine) -> Tuple:
+    """Everything render_inventory_screen shows which can change."""
+    return id(engine.player.inventory), engine.player.inventory.version
+
+def character_screen_key(engine: Engine) -> Tuple:
+    """Everything render_character_screen shows which can change."""
+    weapon, armor = engine.player.equipment.weapon, engine.player.equipment.armor
+    return (
+        tuple((attribute.name, attribute.value, attribute.max) for attribute in engine.player.fighter.attributes),
+        weapon and (weapon.name, weapon.equippable.power_bonus.value),
+        armor and (armor.name, armor.equippable.defense_bonus.value),
+    )
+
 def render_character_screen(
         console: Console, x: int, y: int, width: int, height: int, engine: Engine, in_use: bool = False
 ) -> None:
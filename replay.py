@@ -0,0 +1,217 @@
+"""
+Recording of the input of a game session, and deterministic replay of it without a window.
+
+The main loop records every event it hands to an event handler when the YANETS_RECORD environment variable
+names a file, after seeding the random number generator with a seed written to the same file. Replaying starts
+from the main menu with that seed and feeds the events back through BaseEventHandler.handle_events as fast as
+possible, which reproduces the session exactly:
+
+    python replay.py session.replay [--render]
+
+A replay file is gzip compressed JSON lines, a header followed by one short array per event.
+Sessions which continue a saved game need that save, so the save files present when recording started are
+stored in the header and restored in the temporary directory the replay runs in.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import contextlib
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import traceback
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import tcod
+
+import color
+import exceptions
+import input_handlers
+import perf
+import render_standards
+import setup_game
+
+FORMAT_VERSION = 1
+
+# Save files a session can continue from, see setup_game.MainMenu.
+SAVE_FILES = ("savegame.sav", "debug.sav")
+
+
+def encode_event(event: tcod.event.Event) -> Optional[List[Any]]:
+    """Return 'event' as a list of plain values, or None for events no handler reacts to."""
+    if isinstance(event, (tcod.event.KeyDown, tcod.event.KeyUp)):
+        kind = "kd" if isinstance(event, tcod.event.KeyDown) else "ku"
+        return [kind, int(event.scancode), int(event.sym), int(event.mod), bool(event.repeat)]
+    if isinstance(event, tcod.event.MouseMotion):
+        return [
+            "mm", *event.position, *event.motion, *(event.tile or (0, 0)), *(event.tile_motion or (0, 0)),
+            int(event.state),
+        ]
+    if isinstance(event, (tcod.event.MouseButtonDown, tcod.event.MouseButtonUp)):
+        kind = "md" if isinstance(event, tcod.event.MouseButtonDown) else "mu"
+        return [kind, *event.position, *(event.tile or (0, 0)), int(event.button)]
+    if isinstance(event, tcod.event.MouseWheel):
+        return ["mw", event.x, event.y, bool(event.flipped)]
+    if isinstance(event, tcod.event.TextInput):
+        return ["ti", event.text]
+    if isinstance(event, tcod.event.Quit):
+        return ["q"]
+    return None
+
+
+def decode_event(values: List[Any]) -> tcod.event.Event:
+    """Return the event encoded by encode_event."""
+    kind, *args = values
+    if kind in ("kd", "ku"):
+        event_type = tcod.event.KeyDown if kind == "kd" else tcod.event.KeyUp
+        scancode, sym, mod, repeat = args
+        return event_type(
+            scancode = tcod.event.Scancode(scancode), sym = tcod.event.KeySym(sym), mod = tcod.event.Modifier(mod),
+            repeat = repeat,
+        )
+    if kind == "mm":
+        x, y, motion_x, motion_y, tile_x, tile_y, tile_motion_x, tile_motion_y, state = args
+        return tcod.event.MouseMotion(
+            position = (x, y), motion = (motion_x, motion_y), tile = (tile_x, tile_y),
+            tile_motion = (tile_motion_x, tile_motion_y), state = state,
+        )
+    if kind in ("md", "mu"):
+        event_type = tcod.event.MouseButtonDown if kind == "md" else tcod.event.MouseButtonUp
+        x, y, tile_x, tile_y, button = args
+        return event_type(position = (x, y), tile = (tile_x, tile_y), button = button)
+    if kind == "mw":
+        x, y, flipped = args
+        return tcod.event.MouseWheel(x = x, y = y, flipped = flipped)
+    if kind == "ti":
+        return tcod.event.TextInput(text = args[0])
+    if kind == "q":
+        return tcod.event.Quit()
+    raise exceptions.InvalidReplayFile(f"Unknown event {kind!r} in replay file.")
+
+
+class Recorder:
+    """
+    Writes the events of a session to 'filename'.
+
+    'seed' must be the seed the random module was given before the session started.
+    """
+
+    def __init__(self, filename: str, seed: int):
+        self.file = gzip.open(filename, "wt", encoding = "utf-8")
+        saves = {}
+        for save in SAVE_FILES:
+            if os.path.exists(save):
+                with open(save, "rb") as f:
+                    saves[save] = base64.b64encode(f.read()).decode("ascii")
+        header = {"version": FORMAT_VERSION, "seed": seed, "saves": saves}
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, event: tcod.event.Event) -> None:
+        values = encode_event(event)
+        if values is not None:
+            self.file.write(json.dumps(values, separators = (",", ":")) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read(filename: str) -> Tuple[Dict[str, Any], Iterator[tcod.event.Event]]:
+    """Return the header of a replay file and an iterator over its events."""
+    f = gzip.open(filename, "rt", encoding = "utf-8")
+    header = json.loads(f.readline())
+    if header.get("version") != FORMAT_VERSION:
+        f.close()
+        raise exceptions.InvalidReplayFile(f"Unsupported replay file version {header.get('version')!r}.")
+
+    def events() -> Iterator[tcod.event.Event]:
+        with f:
+            for line in f:
+                # A recording cut short by a crash can end in half a line.
+                with contextlib.suppress(ValueError):
+                    yield decode_event(json.loads(line))
+
+    return header, events()
+
+
+def play(
+        filename: str, render: bool = False, directory: Optional[str] = None, seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Replay 'filename' from the main menu until its events run out or the game quits.
+
+    Giving a 'seed' other than the recorded one plays the same inputs in a different game.
+
+    The replay runs in 'directory', a new temporary one by default, so its save and history files don't touch
+    the real ones. If 'render' is True every event is followed by rendering a frame off-screen, as the game would.
+    Returns the final event handler and how many events, turns and seconds the replay took.
+    """
+    header, events = read(filename)
+    console = tcod.Console(render_standards.screen_width, render_standards.screen_height, order = "F")
+    handler: input_handlers.BaseEventHandler = setup_game.MainMenu(console)    # Loads its image from here.
+
+    with contextlib.ExitStack() as stack:
+        if directory is None:
+            directory = stack.enter_context(tempfile.TemporaryDirectory(prefix = "yanets-replay-"))
+        previous_directory = os.getcwd()
+        os.chdir(directory)
+        stack.callback(os.chdir, previous_directory)
+        for save, data in header["saves"].items():
+            with open(save, "wb") as f:
+                f.write(base64.b64decode(data))
+
+        random.seed(header["seed"] if seed is None else seed)
+        count = 0
+        start = time.perf_counter()
+        for event in events:
+            count += 1
+            try:
+                handler = handler.handle_events(event)
+            except SystemExit:    # Quitting, QuitWithoutSaving included.
+                break
+            except Exception:   # Handled the same as in main.
+                traceback.print_exc()
+                if isinstance(handler, input_handlers.EventHandler):
+                    handler.engine.message_log.add_message(
+                        "".join(traceback.format_exception_only(*sys.exc_info()[:2])), color.error
+                    )
+            if render:
+                with perf.phase("render"):
+                    console.clear()
+                    if isinstance(handler, setup_game.MainMenu):
+                        handler.on_render()
+                    else:
+                        handler.on_render(console = console)
+                handler.mark_rendered()
+        elapsed = time.perf_counter() - start
+
+    engine = handler.engine if isinstance(handler, input_handlers.EventHandler) else None
+    return {
+        "handler": handler,
+        "events": count,
+        "turns": engine.turn_counter if engine is not None else 0,
+        "seconds": elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "Replay a recorded game session without a window.")
+    parser.add_argument("replay", help = "file recorded with YANETS_RECORD")
+    parser.add_argument("--render", action = "store_true", help = "render a frame after every event")
+    args = parser.parse_args()
+
+    result = play(args.replay, render = args.render)
+    print(
+        f"{result['events']} events, {result['turns']} turns in {result['seconds']:.3f} s "
+        f"({result['turns'] / max(result['seconds'], 1e-9):.0f} turns/s)"
+    )
+    if perf.enabled:
+        print("\n".join(perf.report()))
+
+
+if __name__ == "__main__":
+    main()
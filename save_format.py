@@ -0,0 +1,465 @@
+"""
+Structured save files.
+
+A save file is a series of sections followed by an index and a fixed size footer:
+
+    MAGIC | section | section | ... | index (JSON) | index offset (u64) | index length (u32) | MAGIC
+
+Every floor is stored as its own sections: the GameMap and its entities as a pickled record, and each of
+its numpy arrays as a raw buffer. Records and arrays are compressed with the chosen compressor; with no
+compression the array sections are aligned and memory-mapped on load instead of being read and copied.
+The engine, the player and the message log are one more pickled record.
+The index names the game's message history file too, it is deleted once a save of another game replaces this one.
+Objects shared between records (the engine, the player, the floors themselves, actor tables and arrays)
+are written as references and re-linked on load, so each record only holds what belongs to it.
+
+Saving again to the file an engine was loaded from or last saved to is incremental: only the engine record
+and the floors marked dirty are appended, followed by a new index which points the untouched floors at
+their old sections. Once stale sections take up more than half of the file it is rewritten from scratch.
+If the game stops in the middle of an append, the last complete index is found again on load.
+
+Loading reads the engine record and the current floor only; the other floors are read when first entered.
+"""
+from __future__ import annotations
+
+import functools
+import io
+import json
+import lzma
+import os
+import pickle
+import struct
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+import exceptions
+import perf
+import scratch
+from actor_table import ActorTable
+from game_map import GameMap, LazyFloor
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+MAGIC = b"YANETSSV"
+FORMAT_VERSION = 1
+
+FOOTER = struct.Struct("<QI8s")
+ALIGNMENT = 64  # Array sections start on this boundary so they can be mapped directly.
+
+MAP_ARRAYS = ("tiles", "visible", "explored", "tile_exists")
+
+COMPRESSORS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+    "lzma": (lambda data: lzma.compress(data, preset = 0), lzma.decompress),
+    "none": (lambda data: data, lambda data: data),
+}
+
+DEFAULT_COMPRESSION = "zlib"
+
+
+def _descr_to_dtype(descr: Any) -> np.dtype:
+    """Rebuild a dtype from its JSON round-tripped description."""
+    def as_tuples(item: Any) -> Any:
+        if isinstance(item, list):
+            return [tuple(as_tuples(field) for field in entry) if isinstance(entry, list) else entry
+                    for entry in item]
+        return item
+
+    return np.lib.format.descr_to_dtype(as_tuples(descr))
+
+
+class SaveWriter:
+    """
+    Collects the sections of one save file and writes them out.
+
+    A new file is written to a temporary name and atomically replaced. If 'base' is given the sections are
+    appended to that existing file instead, and every section of 'base' not replaced is kept.
+    """
+
+    def __init__(self, filename: str, compression: str = DEFAULT_COMPRESSION, base: Optional[SaveReader] = None):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown save compression {compression!r}")
+        self.filename = filename
+        self.compression = compression
+        self.base = base
+        self.buffer = io.BytesIO()
+        if base is None:
+            self.start = 0
+            self.buffer.write(MAGIC)
+            self.sections: Dict[str, Dict[str, Any]] = {}
+        else:
+            self.start = base.size
+            self.sections = dict(base.sections)
+
+    def _tell(self) -> int:
+        return self.start + self.buffer.tell()
+
+    def _align(self) -> None:
+        padding = -self._tell() % ALIGNMENT
+        self.buffer.write(b"\0" * padding)
+
+    def add_record(self, name: str, data: bytes) -> None:
+        compress, _ = COMPRESSORS[self.compression]
+        payload = compress(data)
+        self.sections[name] = {
+            "kind": "record", "offset": self._tell(), "length": len(payload), "codec": self.compression,
+        }
+        self.buffer.write(payload)
+
+    def add_array(self, name: str, array: np.ndarray) -> None:
+        compress, _ = COMPRESSORS[self.compression]
+        payload = compress(np.asfortranarray(array).tobytes(order = "F"))
+        if self.compression == "none":
+            self._align()
+        self.sections[name] = {
+            "kind": "array",
+            "offset": self._tell(),
+            "length": len(payload),
+            "codec": self.compression,
+            "dtype": np.lib.format.dtype_to_descr(array.dtype),
+            "shape": list(array.shape),
+        }
+        self.buffer.write(payload)
+
+    def write(self, header: Dict[str, Any]) -> None:
+        index = json.dumps({"version": FORMAT_VERSION, **header, "sections": self.sections}).encode("utf-8")
+        index_offset = self._tell()
+        self.buffer.write(index)
+        self.buffer.write(FOOTER.pack(index_offset, len(index), MAGIC))
+
+        if self.base is not None:
+            with open(self.filename, "r+b") as f:
+                f.seek(self.start)
+                f.write(self.buffer.getbuffer())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            return
+
+        temporary = f"{self.filename}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.buffer.getbuffer())
+        os.replace(temporary, self.filename)
+
+
+class SaveReader:
+    """Reads the index of a save file and loads its sections."""
+
+    def __init__(self, filename: str, mmap_arrays: bool = True):
+        self.filename = filename
+        self.mmap_arrays = mmap_arrays
+        with open(filename, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise exceptions.InvalidSaveFile("Not a structured save file.")
+            f.seek(0, os.SEEK_END)
+            self.size = f.tell()
+            f.seek(self.size - FOOTER.size)
+            index_offset, index_length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic == MAGIC and index_offset + index_length + FOOTER.size == self.size:
+                f.seek(index_offset)
+                self.index = json.loads(f.read(index_length).decode("utf-8"))
+            else:
+                # An append was interrupted, fall back on the last complete index.
+                f.seek(0)
+                self.size, self.index = self._recover(f.read())
+
+        if self.index.get("version") != FORMAT_VERSION:
+            raise exceptions.InvalidSaveFile(f"Unsupported save version {self.index.get('version')}.")
+        self.sections: Dict[str, Dict[str, Any]] = self.index["sections"]
+
+    @staticmethod
+    def _recover(data: bytes) -> Tuple[int, Dict[str, Any]]:
+        """Return the end and the contents of the last complete index in 'data'."""
+        end = data.rfind(MAGIC)
+        while end > len(MAGIC):
+            footer_start = end + len(MAGIC) - FOOTER.size
+            if footer_start >= 0:
+                index_offset, index_length, _ = FOOTER.unpack_from(data, footer_start)
+                if index_offset + index_length == footer_start:
+                    try:
+                        index = json.loads(data[index_offset:footer_start].decode("utf-8"))
+                    except ValueError:
+                        index = None
+                    if isinstance(index, dict):
+                        return end + len(MAGIC), index
+            end = data.rfind(MAGIC, 0, end)
+        raise exceptions.InvalidSaveFile("Save file is truncated.")
+
+    @property
+    def live_size(self) -> int:
+        """Number of bytes used by the sections the index points at."""
+        return sum(section["length"] for section in self.sections.values())
+
+    def read_record(self, name: str) -> bytes:
+        section = self.sections[name]
+        with open(self.filename, "rb") as f:
+            f.seek(section["offset"])
+            payload = f.read(section["length"])
+        _, decompress = COMPRESSORS[section["codec"]]
+        return decompress(payload)
+
+    def read_array(self, name: str) -> np.ndarray:
+        section = self.sections[name]
+        dtype = _descr_to_dtype(section["dtype"])
+        shape = tuple(section["shape"])
+        if self.mmap_arrays and section["codec"] == "none":
+            # Copy-on-write: the game can change the array without touching the file.
+            return np.memmap(
+                self.filename, dtype = dtype, mode = "c", offset = section["offset"], shape = shape, order = "F"
+            )
+        _, decompress = COMPRESSORS[section["codec"]]
+        with open(self.filename, "rb") as f:
+            f.seek(section["offset"])
+            data = decompress(f.read(section["length"]))
+        return np.frombuffer(data, dtype = dtype).reshape(shape, order = "F").copy(order = "F")
+
+
+class _RecordPickler(pickle.Pickler):
+    """Pickler which writes shared objects as references instead of copying them into the record."""
+
+    def __init__(self, file: io.BytesIO, references: Dict[int, str], root: Any):
+        super().__init__(file, protocol = pickle.HIGHEST_PROTOCOL)
+        self.references = references
+        self.root = root
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        if obj is self.root:
+            return None
+        return self.references.get(id(obj))
+
+
+class _RecordUnpickler(pickle.Unpickler):
+    """Unpickler which resolves references written by _RecordPickler."""
+
+    def __init__(self, file: io.BytesIO, resolve: Callable[[str], Any]):
+        super().__init__(file)
+        self.resolve = resolve
+
+    def persistent_load(self, pid: str) -> Any:
+        return self.resolve(pid)
+
+
+def _dump_record(obj: Any, references: Dict[int, str], root: Any = None) -> bytes:
+    buffer = io.BytesIO()
+    _RecordPickler(buffer, references, root).dump(obj)
+    return buffer.getvalue()
+
+
+def _load_record(data: bytes, resolve: Callable[[str], Any]) -> Any:
+    return _RecordUnpickler(io.BytesIO(data), resolve).load()
+
+
+def _references(engine: Engine) -> Dict[int, str]:
+    """Map every shared object of 'engine' to the name it is referenced by."""
+    references = {
+        id(engine): "engine",
+        id(engine.player): "player",
+        id(engine.game_world): "world",
+    }
+    for number, floor in enumerate(engine.game_world.floors):
+        references[id(floor)] = f"floor/{number}"
+        if isinstance(floor, LazyFloor):
+            continue
+        if floor.actor_table is not None:
+            references[id(floor.actor_table)] = f"table/{number}"
+        for name in MAP_ARRAYS:
+            references[id(getattr(floor, name))] = f"floor/{number}/{name}"
+    return references
+
+
+class SaveSnapshot:
+    """
+    Everything needed to write one save, taken from the game at a single moment.
+
+    The records are already pickled and the arrays of the floors being written are copied, so write()
+    does not touch the game and can run on another thread while the game goes on.
+    """
+
+    def __init__(self, filename: str, compression: str, base: Optional[SaveReader]):
+        self.filename = filename
+        self.compression = compression
+        self.base = base
+        self.records: Dict[str, bytes] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.header: Dict[str, Any] = {}
+        self.stale_history: Optional[str] = None   # History file of the save being replaced, see write.
+
+    def write(self) -> None:
+        """Compress the snapshot and write it to its file."""
+        with perf.phase("save.write"):
+            writer = SaveWriter(self.filename, self.compression, self.base)
+            for name, data in self.records.items():
+                writer.add_record(name, data)
+            for name, array in self.arrays.items():
+                writer.add_array(name, array)
+            writer.write(self.header)
+        # The replaced save was of another game, nothing refers to its history anymore.
+        if self.stale_history is not None and os.path.exists(self.stale_history):
+            os.remove(self.stale_history)
+
+
+def snapshot(engine: Engine, filename: str, compression: str = DEFAULT_COMPRESSION) -> SaveSnapshot:
+    """
+    Take a snapshot of 'engine' to be written to 'filename'.
+
+    When 'filename' is the engine's own save file only the dirty floors are included, see the module docstring.
+    The floors are marked clean and the engine takes 'filename' as its save file straight away.
+    """
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Unknown save compression {compression!r}")
+    base = _incremental_base(engine, filename, compression)
+    stale_history = None
+    if base is None:
+        # Floors not read yet only exist in the old file, which is about to be replaced.
+        engine.game_world.load_all_floors()
+        engine.save_id = uuid.uuid4().hex
+        stale_history = _history_file(filename)
+    result = SaveSnapshot(filename, compression, base)
+    if stale_history != engine.message_log.history_file:
+        result.stale_history = stale_history
+    references = _references(engine)
+
+    # The engine record holds everything except the floors, which it refers to.
+    engine_references = {key: value for key, value in references.items() if value not in ("engine", "player", "world")}
+    result.records["engine"] = _dump_record(engine, engine_references, root = engine)
+
+    floors = engine.game_world.floors
+    for number, floor in enumerate(floors):
+        if isinstance(floor, LazyFloor):
+            continue    # Unchanged since it was loaded, its sections are kept.
+        if base is None or floor.dirty or f"floor/{number}" not in base.sections:
+            snapshot_floor(result, references, number, floor)
+
+    result.header = {
+        "floors": len(floors), "engine_class": type(engine).__name__, "save_id": engine.save_id,
+        "history_file": engine.message_log.history_file,
+    }
+
+    engine.save_file = filename
+    for floor in floors:
+        if not isinstance(floor, LazyFloor):
+            floor.dirty = False
+
+    return result
+
+
+def save(engine: Engine, filename: str, compression: str = DEFAULT_COMPRESSION) -> None:
+    """Write 'engine' and every floor of its world to 'filename'."""
+    snapshot(engine, filename, compression).write()
+
+
+def _incremental_base(engine: Engine, filename: str, compression: str) -> Optional[SaveReader]:
+    """Return the existing save to append to, or None if the file has to be written from scratch."""
+    if engine.save_file != filename or engine.save_id is None or not os.path.exists(filename):
+        return None
+    try:
+        base = SaveReader(filename, mmap_arrays = False)
+    except (exceptions.InvalidSaveFile, OSError, ValueError):
+        return None
+    if base.index.get("save_id") != engine.save_id or base.index.get("floors", 0) > len(engine.game_world.floors):
+        return None
+    if any(section["codec"] != compression for section in base.sections.values()):
+        return None
+    if base.size > 2 * base.live_size:
+        return None # Mostly stale sections, compact the file by writing it again.
+    return base
+
+
+def _history_file(filename: str) -> Optional[str]:
+    """Return the message history file of the structured save 'filename', if there is one."""
+    if not os.path.exists(filename):
+        return None
+    try:
+        return SaveReader(filename, mmap_arrays = False).index.get("history_file")
+    except (exceptions.InvalidSaveFile, OSError, ValueError):
+        return None
+
+
+def snapshot_floor(result: SaveSnapshot, references: Dict[int, str], number: int, floor: GameMap) -> None:
+    """Add the record and a copy of the arrays of one floor to 'result'."""
+    table_state = floor.actor_table.__dict__ if floor.actor_table is not None else None
+    result.records[f"floor/{number}"] = _dump_record((floor.__dict__, table_state, type(floor)), references)
+    for name in MAP_ARRAYS:
+        array = getattr(floor, name)
+        # Memory-mapped floors are copied into the scratch directory rather than into RAM.
+        copy = scratch.copy(array, name) if floor.use_memmap else np.array(array, order = "F")
+        result.arrays[f"floor/{number}/{name}"] = copy
+
+
+def load(filename: str, mmap_arrays: bool = True, lazy: bool = True) -> Engine:
+    """
+    Load an Engine from 'filename'.
+
+    Only the current floor is read straight away if 'lazy' is True, every other floor is left in the
+    world as a LazyFloor which reads it when GameWorld.get_floor first asks for it.
+    """
+    reader = SaveReader(filename, mmap_arrays)
+    floor_count = reader.index["floors"]
+
+    floors = [GameMap.__new__(GameMap) for _ in range(floor_count)]
+    tables: Dict[int, ActorTable] = {}
+    shared: Dict[str, Any] = {}
+
+    def resolve(pid: str) -> Any:
+        if pid in shared:
+            return shared[pid]
+        kind, number, *rest = pid.split("/") + [""]
+        if kind == "floor" and rest[0]:
+            return reader.read_array(pid)
+        if kind == "floor":
+            return floors[int(number)]
+        if kind == "table":
+            return tables.setdefault(int(number), ActorTable.__new__(ActorTable))
+        raise exceptions.InvalidSaveFile(f"Unknown reference {pid!r} in save file.")
+
+    engine = _load_record(reader.read_record("engine"), resolve)
+    shared.update(engine = engine, player = engine.player, world = engine.game_world)
+
+    for number, floor in enumerate(floors):
+        if lazy and floor is not engine.game_map:
+            engine.game_world.floors[number] = LazyFloor(
+                functools.partial(_read_lazy_floor, reader, resolve, number, floor, tables)
+            )
+        else:
+            read_floor(reader, resolve, number, floor, tables)
+
+    # Saving back to this file only has to write what changes from here on.
+    engine.save_file = filename
+    engine.save_id = reader.index.get("save_id")
+
+    return engine
+
+
+def _read_lazy_floor(
+        reader: SaveReader, resolve: Callable[[str], Any], number: int, floor: GameMap, tables: Dict[int, ActorTable]
+) -> GameMap:
+    read_floor(reader, resolve, number, floor, tables)
+    return floor
+
+
+def read_floor(
+        reader: SaveReader, resolve: Callable[[str], Any], number: int, floor: GameMap, tables: Dict[int, ActorTable]
+) -> None:
+    """Fill in the empty 'floor' from its sections."""
+    state, table_state, *floor_class = _load_record(reader.read_record(f"floor/{number}"), resolve)
+    if floor_class:
+        floor.__class__ = floor_class[0]    # E.g. a ChunkedSurface, the shell was made as a plain GameMap.
+    floor.__setstate__(state)
+    floor.dirty = False
+    if floor.use_memmap:
+        # Uncompressed arrays are already mapped from the save file itself, the rest move to the scratch directory.
+        for name in MAP_ARRAYS:
+            if not scratch.is_mapped(getattr(floor, name)):
+                setattr(floor, name, scratch.copy(getattr(floor, name), name))
+    if table_state is not None:
+        tables.setdefault(number, ActorTable.__new__(ActorTable)).__dict__.update(table_state)
+
+
+def is_structured_save(filename: str) -> bool:
+    """Return True if 'filename' starts with the structured save file magic."""
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
@@ -0,0 +1,62 @@
+"""
+Per-run scratch directory for memory-mapped map arrays.
+
+Arrays made here are backed by files in one temporary directory instead of RAM, so the OS only keeps the
+parts of a very large floor in memory that are being viewed or simulated.
+The directory is created on first use and deleted when the program exits.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+from typing import Any, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+_directory: Optional[str] = None
+_counter = itertools.count()
+
+
+def directory() -> str:
+    """Return the scratch directory of this run, creating it if needed."""
+    global _directory
+    if _directory is None:
+        _directory = tempfile.mkdtemp(prefix = "yanets-")
+        atexit.register(shutil.rmtree, _directory, ignore_errors = True)
+    return _directory
+
+
+def empty(shape: Tuple[int, ...], dtype: Any, name: str = "array") -> np.memmap:
+    """Return a new Fortran ordered array backed by a file in the scratch directory."""
+    path = os.path.join(directory(), f"{next(_counter)}-{name}.dat")
+    array = np.memmap(path, dtype = dtype, mode = "w+", shape = shape, order = "F")
+    try:
+        # The mapping keeps the data alive, and the file goes away with the last reference to the array.
+        os.remove(path)
+    except OSError:
+        pass    # Cannot remove a mapped file on Windows, it is left for the exit cleanup.
+    return array
+
+
+def full(shape: Tuple[int, ...], fill_value: Any, name: str = "array") -> np.memmap:
+    """Like numpy.full, but backed by the scratch directory."""
+    fill_value = np.asarray(fill_value)
+    array = empty(shape, fill_value.dtype, name)
+    if fill_value.tobytes().strip(b"\0"):
+        array[...] = fill_value    # A new file already reads as zeros, so only other values are written.
+    return array
+
+
+def copy(array: np.ndarray, name: str = "array") -> np.memmap:
+    """Return a copy of 'array' backed by the scratch directory."""
+    result = empty(array.shape, array.dtype, name)
+    result[...] = array
+    return result
+
+
+def is_mapped(array: np.ndarray) -> bool:
+    """Return True if 'array' is backed by a file rather than RAM."""
+    return isinstance(array, np.memmap)
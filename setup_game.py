@@ -3,8 +3,10 @@ from __future__ import annotations
 
 import copy
 import lzma
+import os
 import pickle
 import traceback
+import uuid
 from typing import Optional, List
 
 import tcod
@@ -14,15 +16,34 @@ from engine import Engine
 from debug_engine import DebugEngine
 import entity_factories
 from game_map import GameWorld
+from message_log import MessageLog
 import input_handlers
 import render_functions
-
-# Load the background image and remove the alpha channel.
-background_image = tcod.image.load("menu_background.png")[:, :, :3]
-
-
-def new_game(debug: bool = False) -> Engine:
-    """Return a brand new game session as an Engine instance."""
+import save_format
+
+# Optional modes, each off unless its environment variable is set: actors taking their turns in batches
+# (Engine.batch_ai), new floors keeping an ActorTable (GameWorld.use_actor_table) and new dungeon floors
+# keeping their arrays in memmaps (GameWorld.use_memmap).
+BATCH_AI = bool(os.environ.get("YANETS_BATCH_AI"))
+ACTOR_TABLE = bool(os.environ.get("YANETS_ACTOR_TABLE"))
+MEMMAP = bool(os.environ.get("YANETS_MEMMAP"))
+
+def apply_modes(engine: Engine, batch_ai: bool, use_actor_table: bool, use_memmap: bool) -> None:
+    """Set the optional modes of 'engine', floors already generated keep the ones they were made with."""
+    engine.batch_ai = batch_ai
+    engine.game_world.use_actor_table = use_actor_table
+    engine.game_world.use_memmap = use_memmap
+
+def new_game(
+        debug: bool = False, history: bool = True, batch_ai: bool = BATCH_AI, use_actor_table: bool = ACTOR_TABLE,
+        use_memmap: bool = MEMMAP
+) -> Engine:
+    """
+    Return a brand new game session as an Engine instance.
+
+    If 'history' is False messages too old for the message log are dropped instead of kept in a file.
+    The optional modes default to the environment, see BATCH_AI.
+    """
     map_width = render_standards.map_width
     map_height = render_standards.map_height
     map_tiling = render_standards.map_tiling
@@ -31,10 +52,6 @@ def new_game(debug: bool = False) -> Engine:
     room_min_size = 6
     max_rooms = 30
 
-    tileset = tcod.tileset.load_tilesheet(
-        "dejavu10x10_gs_tc.png", 32, 8, tcod.tileset.CHARMAP_TCOD
-    )
-
     player = copy.deepcopy(entity_factories.player)
 
     engine = (Engine(player=player) if not debug else
@@ -50,6 +67,12 @@ def new_game(debug: bool = False) -> Engine:
         map_tiling=map_tiling,
         current_floor=0
     )
+    apply_modes(engine, batch_ai, use_actor_table, use_memmap)
+
+    # Messages too old for the log are kept next to the save file, in a file of this game's own.
+    if history:
+        prefix = "debug" if debug else "savegame"
+        engine.message_log = MessageLog(history_file = f"{prefix}-{uuid.uuid4().hex[:8]}.history")
 
     engine.game_world.generate_floor()
     engine.update_fov()
@@ -60,11 +83,26 @@ def new_game(debug: bool = False) -> Engine:
 
     return engine
 
-def load_game(filename: str) -> Engine:
-    """Load an Engine instance from a file."""
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
+def load_game(
+        filename: str, batch_ai: bool = BATCH_AI, use_actor_table: bool = ACTOR_TABLE, use_memmap: bool = MEMMAP
+) -> Engine:
+    """
+    Load an Engine instance from a file, either a structured save or an older pickled one.
+
+    The optional modes are set as for new_game, floors in the save keep the ones they were made with.
+    """
+    if save_format.is_structured_save(filename):
+        engine = save_format.load(filename)
+    else:
+        with open(filename, "rb") as f:
+            engine = pickle.loads(lzma.decompress(f.read()))
+        # These saves predate stat modifiers and inventory groups, which are rebuilt from what they hold.
+        for game_map in engine.game_world.floors:
+            for actor in game_map.actors:
+                actor.equipment.refresh_modifiers()
+                actor.inventory.regroup()
     assert isinstance(engine, Engine)
+    apply_modes(engine, batch_ai, use_actor_table, use_memmap)
     return engine
 
 class MainMenu(input_handlers.BaseEventHandler):
@@ -73,12 +111,14 @@ class MainMenu(input_handlers.BaseEventHandler):
     def __init__(self, console: tcod.Console):
         """Initializes the MainMenu with a console and cursor position"""
         self.console = console
+        # Load the background image and remove the alpha channel.
+        self.background_image = tcod.image.load("menu_background.png")[:, :, :3]
         self.selection = list(enumerate(["New Game", "Continue Game", "Quit", "DEBUG MODE", "LOAD DEBUG"]))
         self.present_selection = 0
 
     def on_render(self) -> None:
         """Render the main menu on a background image."""
-        self.console.draw_semigraphics(background_image, 0, 0)
+        self.console.draw_semigraphics(self.background_image, 0, 0)
 
         self.console.print(
             self.console.width // 2,
@@ -114,8 +154,10 @@ class MainMenu(input_handlers.BaseEventHandler):
             return input_handlers.MainGameEventHandler(new_game())
         elif event.sym == tcod.event.K_UP:
             self.present_selection = max(self.present_selection - 1, 0)
+            self.redraw = True
         elif event.sym == tcod.event.K_DOWN:
             self.present_selection = min(self.present_selection + 1, len(self.selection) - 1)
+            self.redraw = True
         elif event.sym == tcod.event.K_RETURN or event.sym == tcod.event.K_KP_ENTER:
             if self.present_selection == 0:
                 return input_handlers.MainGameEventHandler(new_game())
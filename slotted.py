@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, Tuple
+
+
+def slot_names(cls: type) -> Tuple[str, ...]:
+    """Return every slot declared by 'cls' and its bases."""
+    names = cls.__dict__.get("_slot_names_cache")
+    if names is None:
+        names = tuple(
+            name
+            for klass in reversed(cls.__mro__)
+            for name in klass.__dict__.get("__slots__", ())
+            if name not in ("__dict__", "__weakref__")
+        )
+        setattr(cls, "_slot_names_cache", names)
+    return names
+
+
+class Slotted:
+    """
+    Base class for game objects which store their attributes in __slots__ instead of a per-instance dict.
+
+    The pickled state is a plain dict of the filled slots, the same shape as a dict-backed object,
+    so saves made before and after the switch to slots can be loaded by either.
+    Slots missing from an older save are filled from copies of 'slot_defaults', and an attribute which has since
+    been moved behind a property is restored into its "_name" slot, or the other way around.
+    """
+    __slots__ = ()
+
+    slot_defaults: Dict[str, Any] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {}
+        for name in slot_names(type(self)):
+            try:
+                state[name] = getattr(self, name)
+            except AttributeError:
+                pass    # Slot was never filled, e.g. an unplaced entity's parent.
+        return state
+
+    def __setstate__(self, state: Any) -> None:
+        if isinstance(state, tuple):
+            # Default (dict state, slot state) pair.
+            dict_state, slot_state = state
+            state = {**(dict_state or {}), **(slot_state or {})}
+        for name, value in self.slot_defaults.items():
+            object.__setattr__(self, name, copy.copy(value))   # Not sharing a mutable default between objects.
+        for name, value in state.items():
+            try:
+                object.__setattr__(self, name, value)
+            except AttributeError:
+                # Attributes since moved behind a property live in "_name", anything else no longer exists.
+                names = slot_names(type(self))
+                if f"_{name}" in names:
+                    object.__setattr__(self, f"_{name}", value)
+                elif name.startswith("_") and name[1:] in names:
+                    object.__setattr__(self, name[1:], value)
@@ -0,0 +1,131 @@
+"""
+Optional export of per-turn and per-frame metrics to a JSON lines file, for analysing long sessions offline.
+
+Set the YANETS_TELEMETRY environment variable to a file name to record the windowed game, or call start().
+Records are handed to a background thread which encodes and writes them, so the game loop only pays for
+building a small dict and putting it on a queue. Starting telemetry enables the perf timers it reports.
+
+Every line is one JSON object with "type" being "turn" or "frame". Turn records hold the turn number, floor,
+map size, the timings and counts perf measured in that turn, and how many more memory blocks Python has
+allocated than at the previous record. Frame records hold the render and present times instead.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+import perf
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+# Seconds the writer waits for a record before flushing what it has written to the file.
+FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+
+
+class TelemetryWriter:
+    """Appends records to 'filename' as JSON lines from a background thread."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.records: queue.SimpleQueue = queue.SimpleQueue()
+        self.file = open(filename, "a", buffering = 1 << 16)
+        self.thread = threading.Thread(target = self._run, name = "telemetry", daemon = True)
+        self.thread.start()
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        """Queue 'record' to be written, it must not be changed afterwards."""
+        self.records.put(record)
+
+    def close(self) -> None:
+        """Write every queued record and close the file."""
+        self.records.put(_STOP)
+        self.thread.join()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                try:
+                    record = self.records.get(timeout = FLUSH_INTERVAL)
+                except queue.Empty:
+                    self.file.flush()   # Nothing came in for a while, make what we have readable.
+                    continue
+                if record is _STOP:
+                    break
+                self.file.write(json.dumps(record, separators = (",", ":")))
+                self.file.write("\n")
+        finally:
+            self.file.close()
+
+
+_writer: Optional[TelemetryWriter] = None
+_allocated_blocks = 0
+
+
+def start(filename: str) -> None:
+    """Start appending telemetry to 'filename', replacing any writer already running."""
+    global _writer, _allocated_blocks
+    stop()
+    perf.enable()
+    _allocated_blocks = sys.getallocatedblocks()
+    _writer = TelemetryWriter(filename)
+    atexit.unregister(stop)
+    atexit.register(stop)
+
+
+def stop() -> None:
+    """Write out the queued records and stop recording."""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def active() -> bool:
+    return _writer is not None
+
+
+def _allocation_delta() -> int:
+    """Return how many memory blocks were allocated since the last call, negative if more were freed."""
+    global _allocated_blocks
+    blocks = sys.getallocatedblocks()
+    delta, _allocated_blocks = blocks - _allocated_blocks, blocks
+    return delta
+
+
+def turn(engine: Engine, number: int) -> None:
+    """Record the turn 'number' of 'engine', which perf.end_turn() has just measured."""
+    if _writer is None:
+        return
+    _writer.emit({
+        "type": "turn",
+        "time": time.time(),
+        "turn": number,
+        "floor": engine.game_world.current_floor,
+        "map_size": [engine.game_map.width, engine.game_map.height],
+        "entities": len(engine.game_map.entities),
+        "timings": dict(perf.turn_timings),
+        "counts": dict(perf.turn_counts),
+        "allocated_blocks": _allocation_delta(),
+    })
+
+
+def frame(turn_number: Optional[int]) -> None:
+    """Record the frame just drawn, with the turn it showed if a game is running."""
+    if _writer is None:
+        return
+    _writer.emit({
+        "type": "frame",
+        "time": time.time(),
+        "turn": turn_number,
+        "render": perf.last_time("render"),
+        "present": perf.last_time("present"),
+        "allocated_blocks": _allocation_delta(),
+    })
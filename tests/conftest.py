@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The game's modules live at the top of the repository rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import headless  # noqa: E402
+import save_format  # noqa: E402
+import setup_game  # noqa: E402
+from actions import TakeDownStairsAction  # noqa: E402
+from engine import Engine  # noqa: E402
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+@pytest.fixture(autouse = True)
+def in_tmp_path(tmp_path, monkeypatch):
+    """Run every test in its own directory, so save and history files don't end up in the repository."""
+    monkeypatch.chdir(tmp_path)
+
+
+def start_game(seed: int = 1, **modes) -> headless.Game:
+    """Return a seeded game which has gone down from the surface to the first dungeon floor."""
+    random.seed(seed)
+    game = headless.Game(setup_game.new_game(history = False, **modes))
+    engine = game.engine
+    engine.player.place(*engine.game_map.downstairs_location, engine.game_map)
+    game.perform(TakeDownStairsAction(engine.player))
+    assert engine.game_world.current_floor == 1
+    return game
+
+
+@pytest.fixture
+def game() -> headless.Game:
+    return start_game()
+
+
+def describe(engine: Engine) -> dict:
+    """Return what a save should keep of 'engine', in a form that can be compared."""
+    player = engine.player
+    floors = []
+    for number in range(len(engine.game_world.floors)):
+        floor = engine.game_world.get_floor(number)
+        floors.append({
+            "type": type(floor).__name__,
+            "entities": [(entity.name, entity.x, entity.y) for entity in floor.entities],
+            "hp": [actor.fighter.hp_attr.value for actor in floor.actors],
+            "arrays": {name: getattr(floor, name).tobytes() for name in save_format.MAP_ARRAYS},
+            "downstairs": floor.downstairs_location,
+        })
+    return {
+        "floor": engine.game_world.current_floor,
+        "player": (player.x, player.y, player.fighter.hp_attr.value, player.fighter.power, player.fighter.defense),
+        "inventory": [(item.name, item.count) for item in player.inventory.items],
+        "turn": engine.turn_counter,
+        "floors": floors,
+    }
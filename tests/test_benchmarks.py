@@ -0,0 +1,10 @@
+from benchmarks import suite
+
+
+def test_suite_runs_at_default_tilings() -> None:
+    results = suite.run(list(suite.BENCHMARKS), list(suite.DEFAULT_TILINGS), [10], seed = 0, repeat_scale = 0)
+
+    assert set(results["results"]) == {
+        key for key, *_ in suite.cases(list(suite.BENCHMARKS), list(suite.DEFAULT_TILINGS), [10])
+    }
+    assert all(result["n"] == 2 for result in results["results"].values())
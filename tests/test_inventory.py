@@ -0,0 +1,72 @@
+import copy
+import pickle
+
+import entity_factories
+from components.inventory import Inventory
+from entity import Item
+
+
+def new_item(prototype: Item) -> Item:
+    return copy.deepcopy(prototype)
+
+
+def test_add_stacks_consumables_and_keeps_order() -> None:
+    inventory = Inventory(capacity = 5)
+    dagger, first_potion, second_potion = (
+        new_item(entity_factories.dagger), new_item(entity_factories.health_potion),
+        new_item(entity_factories.health_potion),
+    )
+
+    inventory.add(dagger)
+    stack = inventory.add(first_potion)
+    assert inventory.add(second_potion) is stack
+
+    assert list(inventory.items) == [dagger, first_potion]
+    assert first_potion.count == 2
+    assert list(inventory.groups) == ["Dagger", "Health Potion"]
+
+
+def test_remove_keeps_the_rest_in_order() -> None:
+    inventory = Inventory(capacity = 100)
+    daggers = [new_item(entity_factories.dagger) for _ in range(50)]
+    for dagger in daggers:
+        inventory.add(dagger)
+
+    for dagger in daggers[::2]:
+        inventory.remove(dagger)
+
+    assert list(inventory.items) == daggers[1::2]
+    assert list(inventory.groups["Dagger"]) == daggers[1::2]
+    for dagger in daggers[1::2]:
+        inventory.remove(dagger)
+    assert not inventory.items and not inventory.groups
+
+
+def test_take_splits_a_stack() -> None:
+    inventory = Inventory(capacity = 5)
+    stack = inventory.add(new_item(entity_factories.health_potion))
+    inventory.add(new_item(entity_factories.health_potion))
+
+    taken = inventory.take(stack)
+
+    assert taken is not stack and taken.count == 1
+    assert list(inventory.items) == [stack] and stack.count == 1
+    assert inventory.take(stack) is stack
+    assert not inventory.items and not inventory.groups
+
+
+def test_inventory_saved_with_lists_loads() -> None:
+    inventory = Inventory(capacity = 5)
+    dagger, potion = new_item(entity_factories.dagger), new_item(entity_factories.health_potion)
+    inventory.add(dagger)
+    inventory.add(potion)
+    state = inventory.__getstate__()
+    state["items"] = list(state["items"])
+    state["groups"] = {name: list(group) for name, group in state["groups"].items()}
+
+    loaded = Inventory.__new__(Inventory)
+    loaded.__setstate__(pickle.loads(pickle.dumps(state)))
+
+    assert [item.name for item in loaded.items] == ["Dagger", "Health Potion"]
+    loaded.remove(next(iter(loaded.groups["Dagger"])))
+    assert [item.name for item in loaded.items] == ["Health Potion"]
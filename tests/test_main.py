@@ -0,0 +1,25 @@
+import tcod
+
+import main
+
+
+def key(sym: tcod.event.KeySym, repeat: bool = False) -> tcod.event.KeyDown:
+    return tcod.event.KeyDown(scancode = 0, sym = sym, mod = tcod.event.Modifier.NONE, repeat = repeat)
+
+
+def motion(x: int) -> tcod.event.MouseMotion:
+    return tcod.event.MouseMotion(position = (x, 0))
+
+
+def test_coalesce_mouse_motion() -> None:
+    events = main.coalesce([motion(1), motion(2), key(tcod.event.KeySym.RETURN), motion(3)])
+    assert [type(event) for event in events] == [tcod.event.MouseMotion, tcod.event.KeyDown, tcod.event.MouseMotion]
+    assert events[0].position == (2, 0)
+
+
+def test_coalesce_key_repeats() -> None:
+    held = [key(tcod.event.KeySym.LEFT)] + [key(tcod.event.KeySym.LEFT, repeat = True)] * 5
+    assert len(main.coalesce(held)) == 1
+    # Repeats of another key are kept, repeats carrying on from the events handled before are dropped.
+    assert len(main.coalesce(held + [key(tcod.event.KeySym.UP, repeat = True)])) == 2
+    assert main.coalesce([key(tcod.event.KeySym.LEFT, repeat = True)], previous = held[0]) == []
@@ -0,0 +1,32 @@
+import color
+import setup_game
+from message_log import MessageLog
+
+
+def fill(log: MessageLog, count: int) -> None:
+    for i in range(count):
+        log.add_message(f"Message {i}", color.white)
+
+
+def test_history_reads_spilled_messages() -> None:
+    log = MessageLog(capacity = 3, history_file = "test.history")
+    fill(log, 10)
+    assert len(log) == 10
+    assert [message.plain_text for message in log.history(0, 10)] == [f"Message {i}" for i in range(10)]
+
+
+def test_new_game_keeps_history_of_saved_game() -> None:
+    old = setup_game.new_game()
+    old.message_log = MessageLog(capacity = 3, history_file = old.message_log.history_file)
+    fill(old.message_log, 10)
+    old.save_as("savegame.sav")
+
+    new = setup_game.new_game()
+    assert new.message_log.history_file != old.message_log.history_file
+    fill(new.message_log, 2000)
+    loaded = setup_game.load_game("savegame.sav")
+    assert loaded.message_log.history(0, 1)[0].plain_text == "Message 0"
+
+    # Once the new game replaces the save the old history goes with it.
+    new.save_as("savegame.sav")
+    assert loaded.message_log.history(0, 1)[0].plain_text.startswith("[Message missing")
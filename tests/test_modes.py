@@ -0,0 +1,84 @@
+import importlib
+import random
+
+import numpy as np  # type: ignore
+import pytest
+import tcod
+
+import headless
+import scratch
+import setup_game
+from conftest import describe, start_game
+
+
+def wait(game, turns: int) -> None:
+    random.seed(5)
+    for _ in range(turns):
+        game.press(tcod.event.KeySym.PERIOD)
+
+
+def test_modes_from_environment(monkeypatch) -> None:
+    monkeypatch.setenv("YANETS_BATCH_AI", "1")
+    monkeypatch.setenv("YANETS_ACTOR_TABLE", "1")
+    monkeypatch.setenv("YANETS_MEMMAP", "1")
+    try:
+        importlib.reload(setup_game)
+        engine = setup_game.new_game(history = False)
+        assert engine.batch_ai
+        assert engine.game_world.use_actor_table and engine.game_world.use_memmap
+        assert engine.game_map.actor_table is not None
+    finally:
+        monkeypatch.undo()
+        importlib.reload(setup_game)
+    assert not setup_game.new_game(history = False).batch_ai
+
+
+@pytest.mark.parametrize("compression", ["zlib", "none"])
+@pytest.mark.parametrize("modes", [
+    {"use_actor_table": True},
+    {"use_memmap": True},
+    {"batch_ai": True, "use_actor_table": True, "use_memmap": True},
+])
+def test_round_trip_and_play_on(modes: dict, compression: str) -> None:
+    game = start_game(**modes)
+    engine = game.engine
+    floor = engine.game_map
+    assert (floor.actor_table is not None) == modes.get("use_actor_table", False)
+    assert scratch.is_mapped(floor.tiles) == modes.get("use_memmap", False)
+    engine.player.fighter.hp_attr.new_max(1000, match_current = True)   # Outlasts the orcs.
+    wait(game, 3)
+
+    engine.save_as("game.sav", compression)
+    loaded = setup_game.load_game("game.sav", **modes)
+    loaded_game = headless.Game(loaded)
+
+    assert describe(loaded) == describe(engine)
+    loaded_floor = loaded.game_map
+    if modes.get("use_actor_table"):
+        table = loaded_floor.actor_table
+        assert table is not None
+        for actor in loaded_floor.actors:
+            assert actor.table is table
+            assert (table.x[actor.row], table.y[actor.row]) == (actor.x, actor.y)
+    if modes.get("use_memmap"):
+        assert all(scratch.is_mapped(getattr(loaded_floor, name)) for name in ("tiles", "visible", "explored"))
+
+    # The loaded game goes on exactly as the one it was saved from.
+    turn = engine.turn_counter
+    wait(game, 10)
+    wait(loaded_game, 10)
+    assert describe(loaded) == describe(engine)
+    assert engine.turn_counter == turn + 10
+    assert engine.player.fighter.hp_attr.value < 1000
+
+
+def test_memmap_arrays_can_be_changed_after_loading() -> None:
+    game = start_game(use_memmap = True)
+    game.engine.save_as("game.sav", "none")
+
+    loaded = setup_game.load_game("game.sav", use_memmap = True)
+    loaded.game_map.explored[:] = True
+    loaded.save_as("copy.sav")
+
+    assert setup_game.load_game("copy.sav").game_map.explored.all()
+    assert not np.asarray(setup_game.load_game("game.sav").game_map.explored).all()
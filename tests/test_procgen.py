@@ -0,0 +1,54 @@
+import numpy as np  # type: ignore
+import pytest
+import tcod
+
+import tile_types
+from benchmarks.suite import new_world
+from conftest import describe, start_game
+from game_map import ChunkedSurface
+
+
+@pytest.mark.parametrize("map_tiling", [1, 2, 3])
+@pytest.mark.parametrize("seed", range(4))
+def test_generate_surface(seed: int, map_tiling: int) -> None:
+    engine = new_world(seed, map_tiling, floor = 0)
+    engine.game_world.generate_floor()
+    surface, player = engine.game_map, engine.player
+
+    assert isinstance(surface, ChunkedSurface)
+    assert surface.tiles["walkable"][player.x, player.y]
+    assert surface.tiles[surface.downstairs_location] == tile_types.down_stairs
+
+    cost = surface.tiles["walkable"].astype(np.int8)
+    distance = tcod.path.maxarray(cost.shape, dtype = np.int32)
+    distance[player.x, player.y] = 0
+    tcod.path.dijkstra2d(distance, cost, 2, 3, out = distance)
+    assert distance[surface.downstairs_location] < np.iinfo(np.int32).max
+
+
+def test_same_seed_same_world() -> None:
+    first, second = start_game(seed = 3), start_game(seed = 3)
+
+    assert describe(first.engine) == describe(second.engine)
+
+
+def test_surface_chunks_are_open_floor() -> None:
+    from procgen import generate_surface_chunk
+
+    assert (generate_surface_chunk(7, -3, 12, 20, 15) == tile_types.surface_floor).all()
+
+
+def test_move_window_clears_paths_of_stashed_actors() -> None:
+    import entity_factories
+
+    engine = new_world(0, 3, floor = 0)
+    engine.game_world.generate_floor()
+    surface = engine.game_map
+    staying = entity_factories.orc.spawn(surface, surface.width // 2, surface.height // 2)
+    leaving = entity_factories.orc.spawn(surface, 0, 0)
+    staying.ai.path, leaving.ai.path = [(staying.x + 1, staying.y)], [(1, 1)]
+
+    surface.move_window(surface.width // 2 + surface.tile_width, surface.height // 2)
+
+    assert staying.ai.path == [(staying.x + 1, staying.y)]
+    assert leaving not in surface.entities and leaving.ai.path == []
@@ -0,0 +1,115 @@
+import os
+import shutil
+
+import numpy as np  # type: ignore
+import pytest
+import tcod
+
+import save_format
+import setup_game
+from conftest import DATA_DIRECTORY, describe
+from game_map import LazyFloor
+
+
+@pytest.mark.parametrize("compression", sorted(save_format.COMPRESSORS))
+def test_round_trip(game, compression: str) -> None:
+    engine = game.engine
+    engine.save_as("game.sav", compression)
+
+    loaded = save_format.load("game.sav", lazy = False)
+
+    assert describe(loaded) == describe(engine)
+    assert loaded.game_map is loaded.game_world.floors[1]
+    assert loaded.player.gamemap is loaded.game_map
+
+
+def test_uncompressed_arrays_are_mapped(game) -> None:
+    game.engine.save_as("game.sav", "none")
+
+    loaded = save_format.load("game.sav")
+
+    assert isinstance(loaded.game_map.tiles, np.memmap)
+    loaded.game_map.explored[:] = True    # Copy-on-write, the file stays as it was.
+    assert not save_format.load("game.sav").game_map.explored.all()
+
+
+def test_incremental_save_appends_dirty_floors(game) -> None:
+    engine = game.engine
+    engine.save_as("game.sav")
+    first = save_format.SaveReader("game.sav")
+
+    for _ in range(3):
+        game.press(tcod.event.KeySym.PERIOD)
+    engine.save_as("game.sav")
+    second = save_format.SaveReader("game.sav")
+
+    assert second.size > first.size
+    # The surface didn't change, so its sections are the ones written the first time.
+    assert second.sections["floor/0"] == first.sections["floor/0"]
+    assert second.sections["floor/1"] != first.sections["floor/1"]
+    assert describe(save_format.load("game.sav", lazy = False)) == describe(engine)
+
+
+def test_interrupted_append_falls_back_on_last_index(game) -> None:
+    engine = game.engine
+    engine.save_as("game.sav")
+    expected = describe(save_format.load("game.sav", lazy = False))
+    size = os.path.getsize("game.sav")
+
+    game.press(tcod.event.KeySym.PERIOD)
+    engine.save_as("game.sav")
+    with open("game.sav", "r+b") as f:
+        f.truncate(size + (os.path.getsize("game.sav") - size) // 2)
+
+    assert describe(save_format.load("game.sav", lazy = False)) == expected
+
+
+def test_lazy_floors(game) -> None:
+    engine = game.engine
+    engine.save_as("game.sav")
+    expected = describe(engine)
+
+    loaded = save_format.load("game.sav")
+
+    assert isinstance(loaded.game_world.floors[0], LazyFloor)
+    assert loaded.game_world.resident_floors == 1
+    # Saving back to the same file keeps the floor that was never read.
+    loaded.save_as("game.sav")
+    assert isinstance(loaded.game_world.floors[0], LazyFloor)
+    assert describe(loaded) == expected
+    assert loaded.game_world.resident_floors == 2
+    assert describe(save_format.load("game.sav")) == expected
+
+
+def test_load_baseline_pickle_save() -> None:
+    """A save written by the original lzma pickle format, with a dagger and leather armor equipped."""
+    shutil.copy(os.path.join(DATA_DIRECTORY, "baseline.sav"), "baseline.sav")
+
+    engine = setup_game.load_game("baseline.sav")
+    player = engine.player
+
+    assert not save_format.is_structured_save("baseline.sav")
+    assert engine.game_world.current_floor == 1
+    assert player.equipment.weapon.name == "Dagger"
+    assert player.equipment.armor.name == "Leather Armor"
+    assert (player.fighter.power, player.fighter.defense) == (6, 4)
+    assert [name for name, _ in player.inventory.summary] == []
+    assert all(
+        actor.fighter.modifiers == {} for actor in engine.game_map.actors if actor is not player
+    )
+
+    engine.save_as("converted.sav")
+    assert describe(setup_game.load_game("converted.sav")) == describe(engine)
+
+
+def test_load_entity_state_with_underscored_position() -> None:
+    """Entity positions were pickled as "_x" and "_y" while they were properties on every entity."""
+    import entity_factories
+
+    state = entity_factories.health_potion.__getstate__()
+    del state["x"]
+    state["_x"], state["_y"] = 7, state.pop("y")
+    item = type(entity_factories.health_potion).__new__(type(entity_factories.health_potion))
+    item.__setstate__(state)
+
+    assert (item.x, item.y) == (7, entity_factories.health_potion.y)
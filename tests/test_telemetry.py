@@ -0,0 +1,22 @@
+import json
+
+import tcod
+
+import perf
+import telemetry
+
+
+def test_turn_records_match_turn_counter(game, monkeypatch) -> None:
+    monkeypatch.setattr(perf, "enabled", perf.enabled)    # Starting telemetry enables perf.
+    first_turn = game.engine.turn_counter
+    telemetry.start("telemetry.jsonl")
+    try:
+        for _ in range(3):
+            game.press(tcod.event.KeySym.PERIOD)
+    finally:
+        telemetry.stop()
+
+    with open("telemetry.jsonl") as f:
+        turns = [record["turn"] for record in map(json.loads, f) if record["type"] == "turn"]
+    assert turns == [first_turn + 1, first_turn + 2, first_turn + 3]
+    assert game.engine.turn_counter == first_turn + 3